@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_file, render_template
+from flask import Flask, Response, request, jsonify, send_file, render_template
 import os
 import cv2
 import shutil
@@ -6,9 +6,14 @@ import matplotlib.pyplot as plt
 from PIL import Image
 import segformer_b0 as seg
 import path_finding as pf
-import firing as fire
 from utils import shared_data
-import threading
+from map_snapshot import MapSnapshot
+from batch_planning import BatchPlanner
+import sessions
+import wire
+import metrics
+import time
+import atexit
 import math
 import numpy as np
 
@@ -23,26 +28,64 @@ VEHICLE_LENGTH = int(11.0)
 
 # 월드 크기 정의
 WORLD_SIZE = 300  # 300x300 미터
+# 격자 해상도 (셀 한 변의 미터, 0.25 ~ 4.0): 크게 하면 장거리 탐색이 빠르고 작게 하면 좁은 지형에 유리
+GRID_CELL_SIZE = 1.0
+GRID_ORIGIN = (0.0, 0.0)
+# 장애물 확장(통과 불가) 거리와 근접 비용 지도 설정 (미터)
+OBSTACLE_INFLATION = 6.0
+COSTMAP_RADIUS = 15.0
+COSTMAP_WEIGHT = 20.0
+COSTMAP_DECAY = 0.2
 
-# 적 감지 여부
-enemy_detected = False
-detected_buffer = 0
-destination_buffer = 0
-enemy_list = []
+# 지도 스냅샷 (재시작 시 장애물 재동기화 생략), 주기적으로 및 종료 시 디스크에 반영
+MAP_SNAPSHOT_DIR = "map_snapshot"
+MAP_FLUSH_INTERVAL = 5.0  # 초
+# 배치 경로 탐색 작업자 프로세스 수 (None이면 batch_planning.DEFAULT_PROCESSES와 CPU 개수 중 작은 값)
+BATCH_PLANNER_PROCESSES = None
+# 동시에 처리할 /detect 요청 수 (초과 요청은 대기 없이 503), 제어 요청이 감지 요청 뒤에 밀리지 않도록 제한
+DETECT_CONCURRENCY = 1
+# /info 텔레메트리 기록 파일 (fire_replay.py로 재생), None이면 기록하지 않음 (기본 외 전차는 파일 이름에 ID 추가)
+FIRE_TELEMETRY_LOG = None
+# 전차별 스테레오 캡처 폴더 {전차 ID: (왼쪽, 오른쪽)}, 없는 전차는 segformer_b0의 기본 폴더
+STEREO_DIRS = {}
+# 전차 세션 (요청의 X-Tank-Id 헤더 또는 tank 쿼리 인자, 없으면 기본 전차)
+SESSION_CONFIG = sessions.SessionConfig()
 
 # 초기화
-grid = pf.Grid(width=WORLD_SIZE, height=WORLD_SIZE)
+map_snapshot = MapSnapshot(MAP_SNAPSHOT_DIR)
+grid = map_snapshot.open(width=WORLD_SIZE, height=WORLD_SIZE, cell_size=GRID_CELL_SIZE, origin=GRID_ORIGIN,
+                         inflation=OBSTACLE_INFLATION, costmap_radius=COSTMAP_RADIUS,
+                         costmap_weight=COSTMAP_WEIGHT, costmap_decay=COSTMAP_DECAY)
 pathfinding = pf.Pathfinding()
 nav_config = pf.NavigationConfig()
-nav_controller = pf.NavigationController(nav_config, pathfinding, grid)
-obstacles_list = []
+# 배치 경로 탐색 (작업자 프로세스는 첫 /plan_batch 요청 때 시작)
+batch_planner = BatchPlanner(grid, nav_config, processes=BATCH_PLANNER_PROCESSES)
+map_snapshot.start_autoflush(grid, MAP_FLUSH_INTERVAL)
+atexit.register(map_snapshot.close, grid)
+# 감지 모델은 모든 전차가 공유 (동시 추론 수 제한)
+perception = sessions.PerceptionPool(seg_model, image_processor, DETECT_CONCURRENCY)
 
 result_dir = "results"
 os.makedirs(result_dir, exist_ok=True)
-latest_result = os.path.join(result_dir, "latest_result.png")
 
-# 평시 정찰 코드
-turret_rotate = 'Q'
+def create_session(tank_id):
+    # 지도와 경로 탐색기는 공유, 항법/사격 통제/표적 추적/감지 상태는 전차별
+    # 기본 전차는 기존 shared_data 싱글턴과 파일 경로를 그대로 사용
+    return sessions.TankSession(
+        tank_id, grid, pathfinding, nav_config,
+        image_path=sessions.session_path('temp_image.jpg', tank_id),
+        result_path=sessions.session_path(os.path.join(result_dir, "latest_result.png"), tank_id),
+        shared_data=shared_data if tank_id == sessions.DEFAULT_TANK_ID else None,
+        stereo_dirs=STEREO_DIRS.get(tank_id),
+        telemetry_log=FIRE_TELEMETRY_LOG)
+
+session_manager = sessions.SessionManager(create_session, SESSION_CONFIG)
+session_manager.get(sessions.DEFAULT_TANK_ID)
+session_manager.start()
+atexit.register(session_manager.close)
+
+def current_session():
+    return session_manager.get(sessions.request_tank_id(request))
 
 # 각도 변환용
 def change_degree(my_d):
@@ -59,48 +102,105 @@ def get_target_coord(now_x, now_y, turret_x, distance):
     enemy_y = math.cos(rad) * distance + now_y
     return enemy_x, enemy_y
 
+# 상태 지표 (/metrics 출력 시점에 읽음)
+metrics.gauge("tank_grid_cells", "Navigation grid cell count", lambda: grid.width * grid.height)
+metrics.gauge("tank_grid_cell_size_meters", "Navigation grid cell size", lambda: grid.cell_size)
+metrics.gauge("tank_grid_obstacles", "Obstacles stored in the map", lambda: len(grid.obstacles))
+metrics.gauge("tank_grid_version", "Map version (bumped on every obstacle change)", lambda: grid.version)
+metrics.gauge("tank_sessions", "Active tank sessions", lambda: len(session_manager))
+# 아래는 모든 세션의 합계
+metrics.gauge("tank_route_waypoints", "Waypoints in current routes",
+              lambda: sum(len(s.nav_controller.waypoints) for s in session_manager.all()))
+metrics.gauge("tank_actual_path_points", "Recorded actual path points",
+              lambda: sum(len(s.nav_controller.actual_path) for s in session_manager.all()))
+metrics.gauge("tank_planner_busy", "Route planners with pending work",
+              lambda: sum(s.nav_controller.planner.busy for s in session_manager.all()))
+metrics.gauge("tank_live_subscribers", "Live visualization subscribers",
+              lambda: sum(len(s.nav_controller.live_stream.subscribers) for s in session_manager.all()))
+metrics.gauge("tank_live_queued_events", "Events queued for live visualization subscribers",
+              lambda: sum(sub.events.qsize() for s in session_manager.all()
+                          for sub in list(s.nav_controller.live_stream.subscribers)))
+metrics.gauge("tank_detect_in_flight", "Detection requests in progress", lambda: perception.in_flight)
+
+@app.before_request
+def start_request_timer():
+    request.started_at = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    # 경로 변수 대신 규칙 문자열로 묶어 label 수를 제한 (매칭되지 않은 요청은 "unmatched")
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    started = getattr(request, "started_at", None)
+    if started is not None:
+        metrics.REQUEST_SECONDS.labels(route=route).observe(time.perf_counter() - started)
+    metrics.REQUESTS.labels(route=route, status=response.status_code).inc()
+    return response
+
+@app.errorhandler(sessions.SessionError)
+def session_error(e):
+    return jsonify({"status": "ERROR", "message": str(e)}), e.status
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/detect', methods=['POST'])
 def detect():
-    global enemy_detected
-    global detected_buffer
-    global enemy_list
-    print(f'🔭 Detected Enemy : {enemy_detected}')
+    # 감지(세그멘테이션) 작업 스레드 수를 제한하여 나머지 스레드는 항상 제어 요청을 처리
+    # 모든 전차가 감지 모델 하나를 공유하므로 대기 없이 거절하여 제어 요청이 밀리지 않도록 함
+    session = current_session()
+    if not perception.try_acquire():
+        return jsonify({"error": "Detection busy"}), 503
+    try:
+        return _detect(session)
+    finally:
+        perception.release()
+
+def _detect(session):
+    print(f'🔭 [{session.tank_id}] Detected Enemy : {session.enemy_detected}')
     image = request.files.get('image')
     if not image:
         return jsonify({"error": "No image received"}), 400
 
-    image_path = 'temp_image.jpg'
+    image_path = session.image_path
     image.save(image_path)
 
-    prediction = seg.predict_segmentation(image_path, seg_model, image_processor)
-    seg.visualize_segmentation(image_path, prediction, latest_result)
+    with metrics.timer("segmentation"):
+        prediction = seg.predict_segmentation(image_path, perception.model, perception.processor)
+    with metrics.timer("segmentation_render"):
+        seg.visualize_segmentation(image_path, prediction, session.result_path)
 
-    result = seg.get_vehicle_distance(seg_model, image_processor)
-    enemy_list = result
+    with metrics.timer("vehicle_distance"):
+        result = seg.get_vehicle_distance(perception.model, perception.processor, *(session.stereo_dirs or ()))
+    session.enemy_list = result
+    target = session.targeting.observe(result, session.shared_data.get_data())
+    if target:
+        print(f'🎯 Target: track {target["id"]} distance {target["distance"]:.1f} score {target["score"]:.2f}')
 
     if result:
-        enemy_detected = True
-        detected_buffer = 0
+        session.enemy_detected = True
+        session.detected_buffer = 0
         for i in result:
             id = i['id']
             distance = i['distance']
             piexles = i['pixels']
             print(f'🫡 ID {id} Distance: {distance} / Count: {piexles}')
     else:
-        detected_buffer += 1
-        if detected_buffer > 1:
-            enemy_detected = False
-            detected_buffer = 0
+        session.detected_buffer += 1
+        if session.detected_buffer > 1:
+            session.enemy_detected = False
+            session.detected_buffer = 0
     filtered_results = []
 
     return (filtered_results), 200
 
 @app.route('/latest_result')
 def get_latest_result():
+    latest_result = current_session().result_path
     if os.path.exists(latest_result):
         return send_file(latest_result, mimetype='image/png')
     else:
@@ -108,173 +208,227 @@ def get_latest_result():
 
 
 # Flask 라우팅
+def update_telemetry(session, data):
+    # 텔레메트리 반영: 세션의 shared_data 갱신 + 항법 위치 갱신 (잘못된 데이터면 KeyError/ValueError/TypeError)
+    # 위치를 먼저 확인하여 잘못된 데이터가 마지막 정상 텔레메트리를 덮어쓰지 않도록 함
+    player_pos = data["playerPos"]
+    position = (float(player_pos["x"]), 0.0, float(player_pos["z"]))
+    session.shared_data.set_data(data)
+    if session.telemetry_recorder:
+        session.telemetry_recorder.record(data)
+    return session.nav_controller.update_position(position)
+
+# 요청/응답 형식은 Content-Type/Accept로 선택 (JSON, MessagePack, 고정 바이너리 - wire.py 참고)
 @app.route('/info', methods=['POST'])
 def info():
-    data = request.get_json()
+    session = current_session()
     try:
-        shared_data.set_data(data)
-        player_pos = data["playerPos"]
-        x, z = float(player_pos["x"]), float(player_pos["z"])
-        result = nav_controller.update_position(f"{x},0,{z}")
-        return jsonify(result)
+        return wire.encode(update_telemetry(session, wire.decode(request, "telemetry")), "pose",
+                           wire.response_format(request))
     except (KeyError, ValueError, TypeError) as e:
         print(f"Error in /info: {e}")
         return jsonify({"status": "ERROR", "message": "Invalid data"}), 400
 
 @app.route('/update_position', methods=['POST'])
 def update_position():
-    data = request.get_json()
+    try:
+        data = wire.decode(request, "position", key="position")
+    except wire.WireFormatError as e:
+        return jsonify({"status": "ERROR", "message": str(e)}), 400
     if not data or "position" not in data:
         return jsonify({"status": "ERROR", "message": "위치 데이터 누락"}), 400
-    result = nav_controller.update_position(data["position"])
+    result = current_session().nav_controller.update_position(data["position"])
     if result["status"] == "ERROR":
         return jsonify(result), 400
-    return jsonify(result)
+    return wire.encode(result, "pose", wire.response_format(request))
 
 @app.route('/update_obstacle', methods=['POST'])
 def update_obstacle():
-    global obstacles_list
     data = request.get_json()
     try:
-        obstacles = data["obstacles"]
-        for obstacle in obstacles:
-            x_min = float(obstacle["x_min"])
-            x_max = float(obstacle["x_max"])
-            z_min = float(obstacle["z_min"])
-            z_max = float(obstacle["z_max"])
-            grid.set_obstacle(x_min, x_max, z_min, z_max)
-            obstacles_list.append({
-                "x_min": x_min,
-                "x_max": x_max,
-                "z_min": z_min,
-                "z_max": z_max
-            })
-        # print(f"Obstacles Updated: {obstacles_list}")
-        return jsonify({"status": "OK"})
+        obstacles = [{
+            "x_min": float(obstacle["x_min"]),
+            "x_max": float(obstacle["x_max"]),
+            "z_min": float(obstacle["z_min"]),
+            "z_max": float(obstacle["z_max"]),
+            "id": obstacle.get("id")
+        } for obstacle in data["obstacles"]]
+        if data.get("sync"):
+            # 전체 목록 동기화: 새로 생기거나 사라진 장애물만 반영
+            added, removed = grid.sync_obstacles(obstacles)
+        else:
+            added = sum(grid.set_obstacle(o["x_min"], o["x_max"], o["z_min"], o["z_max"], o["id"]) for o in obstacles)
+            removed = 0
+        # print(f"Obstacles Updated: {grid.original_obstacles}")
+        return jsonify({"status": "OK", "added": added, "removed": removed, "total": len(grid.obstacles)})
     except (KeyError, ValueError, TypeError) as e:
         print(f"Error in /update_obstacle: {e}")
         return jsonify({"status": "ERROR", "message": "Invalid obstacle data"}), 400
 
 @app.route('/set_destination', methods=['POST'])
 def set_destination():
-    data = request.get_json()
+    try:
+        data = wire.decode(request, "position", key="destination")
+    except wire.WireFormatError as e:
+        return jsonify({"status": "ERROR", "message": str(e)}), 400
     if not data or "destination" not in data:
         return jsonify({"status": "ERROR", "message": "목적지 데이터 누락"}), 400
-    result = nav_controller.set_destination(data["destination"])
+    # 요청 응답에 경로를 담기 위해 첫 탐색 결과를 잠시 대기 (제어 루프의 호출은 대기하지 않음)
+    result = current_session().nav_controller.set_destination(data["destination"],
+                                                              wait=nav_config.planning_time_budget(grid) * 2)
     print('Destination:' , data["destination"], type(data["destination"]))
     if result["status"] == "ERROR":
         return jsonify(result), 400
-    return jsonify(result)
+    return wire.encode(result, "route", wire.response_format(request))
 
-@app.route('/get_move', methods=['GET'])
-def get_move():
-    global enemy_detected
-    global enemy_list
-    global destination_buffer
-    if enemy_detected:
-        data = shared_data.get_data()
-        if enemy_list == None:
+@app.route('/plan_batch', methods=['POST'])
+def plan_batch():
+    # 같은 지도에서 여러 (출발, 목표) 쌍을 한 번에 탐색
+    data = request.get_json()
+    try:
+        queries = [((float(q["start"][0]), float(q["start"][1])), (float(q["goal"][0]), float(q["goal"][1])))
+                   for q in data["queries"]]
+        time_budget = data.get("time_budget")
+        time_budget = float(time_budget) if time_budget is not None else None
+    except (KeyError, IndexError, ValueError, TypeError) as e:
+        print(f"Error in /plan_batch: {e}")
+        return jsonify({"status": "ERROR", "message": "Invalid batch query"}), 400
+    routes = batch_planner.plan_many(queries, time_budget)
+    return jsonify({"status": "OK", "routes": routes})
+
+def move_command(session, data):
+    nav_controller = session.nav_controller
+    if session.enemy_detected:
+        if session.enemy_list == None:
             print('Stop the tank')
-            return jsonify({"move": "STOP"})
-        enemies = len(enemy_list)
-        if enemies == 1:
-            # 사정거리 안에 있으면 그 자리에서 멈춰서 쏘자
-            distance = enemy_list[0]['distance']
-            if distance < 105:
-                print('Stop the tank')
-                return jsonify({"move": "STOP"})
-            else:
-                x = data['playerPos']['x']
-                y = data['playerPos']['y']
-                z = data['playerPos']['z']
-                turret_x = data['playerTurretX']
-                enemy_x, enemy_z = get_target_coord(x, z, turret_x, distance)
-                if destination_buffer == 0:
-                    nav_controller.set_destination(f'{enemy_x},{y},{enemy_z}')
-                    print(f'Destination has been changed: {enemy_x},{y},{enemy_z}')
-                    destination_buffer += 1
-                else:
-                    destination_buffer += 1
-                    if destination_buffer > 16:
-                        destination_buffer = 0
-                command = nav_controller.get_move()
-                print(f'Moving Command: {command}')
-                return jsonify(command)
+            return {"move": "STOP"}
+        target = session.targeting.target
+        if target is None:
+            command = nav_controller.get_move()
+            print(f'Moving Command: {command}')
+            return command
+        # 사정거리 안에 있으면 그 자리에서 멈춰서 쏘자 (여러 대가 보이면 조금 더 가까이서 정지)
+        distance = target['distance']
+        if distance < (105 if len(session.enemy_list) == 1 else 100):
+            print('Stop the tank')
+            return {"move": "STOP"}
         else:
-            target_id = 0
-            target_distance = 1000
-            for i, enemy in enumerate(enemy_list):
-                if enemy.get['distance'] < target_distance:
-                    target_id = i
-                        # 사정거리 안에 있으면 그 자리에서 멈춰서 쏘자
-            distance = enemy_list[target_id]['distance']
-            if distance < 100:
-                print('Stop the tank')
-                return jsonify({"move": "STOP"})
+            x = data['playerPos']['x']
+            y = data['playerPos']['y']
+            z = data['playerPos']['z']
+            enemy_x, enemy_z = get_target_coord(x, z, target['bearing'], distance)
+            if session.destination_buffer == 0:
+                nav_controller.set_destination((enemy_x, y, enemy_z))
+                print(f'Destination has been changed: {enemy_x},{y},{enemy_z}')
+                session.destination_buffer += 1
             else:
-                x = data['playerPos']['x']
-                y = data['playerPos']['y']
-                z = data['playerPos']['z']
-                turret_x = data['playerTurretX']
-                enemy_x, enemy_z = get_target_coord(x, z, turret_x, distance)
-                if destination_buffer == 0:
-                    nav_controller.set_destination(f'{enemy_x},{y},{enemy_z}')
-                    print(f'Destination has been changed: {enemy_x},{y},{enemy_z}')
-                    destination_buffer += 1
-                else:
-                    destination_buffer += 1
-                    if destination_buffer > 16:
-                        destination_buffer = 0
-                command = nav_controller.get_move()
-                print(f'Moving Command: {command}')
-                return jsonify(command)
+                session.destination_buffer += 1
+                if session.destination_buffer > 16:
+                    session.destination_buffer = 0
+            command = nav_controller.get_move()
+            print(f'Moving Command: {command}')
+            return command
     else:
         command = nav_controller.get_move()
         print(f'Moving Command: {command}')
-        return jsonify(command)
+        return command
+
+@app.route('/get_move', methods=['GET'])
+def get_move():
+    session = current_session()
+    return wire.encode(move_command(session, session.shared_data.get_data()), "move", wire.response_format(request))
 
 @app.route('/visualization', methods=['GET'])
 def get_visualization():
+    # 요청이 있을 때만 (최대 VISUALIZATION_MAX_RATE 빈도로) 다시 렌더링
+    visualizer = current_session().nav_controller.visualizer
+    visualizer.request()
     try:
-        return send_file("path_visualization.html")
+        return send_file(visualizer.output_path)
     except FileNotFoundError:
         return jsonify({"status": "ERROR", "message": "Visualization file not found. Please set a destination first."}), 404
 
-@app.route('/get_action', methods=['GET'])
-def get_action():
-    global enemy_detected
-    global turret_rotate
-    global enemy_list
-    data = shared_data.get_data()
-    if enemy_detected:
-        if enemy_list == None:
-            return jsonify({"turret": "", "weight": 0.0})
-        enemies = len(enemy_list)
-        if enemies == 1:
-            data['distance'] = enemy_list[0].get('distance')
-            context = fire.Initialize(data)
-            turret = fire.TurretControl(context)
-            result = turret.normal_control()
-            if result == None:
-                return jsonify({"turret": "", "weight": 0.0})
-            if len(result) == 2:
-                command = {"turret": result[0], "weight": result[1]}
-            else:
-                command = {"turret": result}
-            if command:
-                print(f"🔫 Action Command: {command}")
-                return jsonify(command)
-            else:
-                return jsonify({"turret": "", "weight": 0.0})
+@app.route('/visualization/live', methods=['GET'])
+def get_live_visualization():
+    # 변경분 스트림을 받아 그리는 정적 페이지
+    return send_file("live_view.html")
+
+@app.route('/visualization/stream', methods=['GET'])
+def stream_visualization():
+    # Server-Sent Events: 접속 시 전체 상태, 이후에는 틱마다 변경분만 전송
+    return Response(current_session().nav_controller.live_stream.stream(), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def action_command(session, data):
+    if session.enemy_detected:
+        target = session.targeting.target
+        if session.enemy_list == None or target is None:
+            return {"turret": "", "weight": 0.0}
+        # 선택된 표적 기준으로 조준 (공유 텔레메트리는 변경하지 않음)
+        data = dict(data, distance=target['distance'])
+        if target['localized']:
+            data['enemyPos'] = {"x": target['x'], "y": target['y'], "z": target['z']}
+        result = session.fire_session.update(data)
+        if result == None:
+            return {"turret": "", "weight": 0.0}
+        if isinstance(result, tuple):
+            command = {"turret": result[0], "weight": result[1]}
+        else:
+            command = {"turret": result}
+        print(f"🔫 Action Command: {command}")
+        return command
     else:
         turret_x = change_degree(data['playerTurretX'])
         body_x =  change_degree(data['playerBodyX'])
         heading = turret_x - body_x
         if heading > 45:
-            turret_rotate = 'Q'
+            session.turret_rotate = 'Q'
         elif heading < -45:
-            turret_rotate = 'E'
-        return jsonify({"turret": turret_rotate, "weight": 0.3})
+            session.turret_rotate = 'E'
+        return {"turret": session.turret_rotate, "weight": 0.3}
+
+@app.route('/get_action', methods=['GET'])
+def get_action():
+    session = current_session()
+    return wire.encode(action_command(session, session.shared_data.get_data()), "action",
+                       wire.response_format(request))
+
+@app.route('/tick', methods=['POST'])
+def tick():
+    # 프레임당 한 번의 요청: 텔레메트리 반영 후 이동 명령, 포탑 명령, 감지 상태를 함께 반환
+    # (/info, /get_move, /get_action을 차례로 호출한 것과 같은 결과)
+    session = current_session()
+    try:
+        data = wire.decode(request, "telemetry")
+        pose = update_telemetry(session, data)
+        move = move_command(session, data)
+        action = action_command(session, data)
+    except (KeyError, ValueError, TypeError) as e:
+        print(f"Error in /tick: {e}")
+        return jsonify({"status": "ERROR", "message": "Invalid data"}), 400
+    return wire.encode({
+        "status": pose["status"],
+        "pose": pose,
+        "move": move,
+        "action": action,
+        "detection": {
+            "enemy_detected": session.enemy_detected,
+            "enemies": len(session.enemy_list) if session.enemy_list else 0,
+            "target": session.targeting.target,
+        },
+    }, "tick", wire.response_format(request))
+
+@app.route('/sessions', methods=['GET'])
+def list_sessions():
+    return jsonify({"status": "OK", "sessions": [session.describe() for session in session_manager.all()]})
+
+@app.route('/sessions/<tank_id>', methods=['DELETE'])
+def remove_session(tank_id):
+    # 전차 세션 즉시 제거 (다음 요청 시 새로 생성)
+    if not session_manager.remove(tank_id):
+        return jsonify({"status": "ERROR", "message": f"No session for {tank_id}"}), 404
+    return jsonify({"status": "OK"})
 
 if __name__ == '__main__':
+    # 개발용 서버 (리로더/디버거), 시뮬레이터 연결 운영은 serve.py 사용
     app.run(host='0.0.0.0', port=5052, debug=True)
\ No newline at end of file
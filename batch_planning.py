@@ -0,0 +1,129 @@
+import os
+import sys
+import atexit
+import pickle
+import subprocess
+import threading
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import path_finding as pf
+from batch_worker import SHARED_LAYERS
+
+# 여러 전차의 (출발, 목표) 쌍을 한 번에 탐색하는 배치 경로 탐색
+# 장애물/비용 레이어는 공유 메모리에 두고 프로세스 풀의 각 작업자가 복사 없이 붙어서 사용
+# 풀은 별도 작업자 프로세스(batch_worker.py)가 만들고, 작업자 프로세스와 공유 메모리는 첫 plan_many 때 생성
+# 감지 모델과 스레드가 올라간 서버 프로세스를 fork하지 않고, 풀 작업자가 서버 시작 스크립트를 다시 실행하지도 않음
+
+DEFAULT_PROCESSES = 2
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_worker.py")
+
+
+class SharedGrid:
+    def __init__(self, grid: pf.Grid):
+        self.grid = grid
+        self.version = None
+        self.segments: Dict[str, shared_memory.SharedMemory] = {}
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, dtype in SHARED_LAYERS:
+            nbytes = max(1, grid.width * grid.height * np.dtype(dtype).itemsize)
+            segment = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.segments[name] = segment
+            self.arrays[name] = np.ndarray((grid.width, grid.height), dtype=dtype, buffer=segment.buf)
+        self.sync()
+
+    def descriptor(self) -> Dict:
+        # 작업자가 공유 메모리에 붙기 위한 정보 (pickle 가능)
+        return {
+            "grid": {
+                "width": self.grid.world_width,
+                "height": self.grid.world_height,
+                "cell_size": self.grid.cell_size,
+                "origin": (self.grid.origin_x, self.grid.origin_z),
+            },
+            "segments": {name: self.segments[name].name for name, _ in SHARED_LAYERS},
+        }
+
+    def sync(self) -> bool:
+        # 지도가 바뀐 경우에만 공유 메모리로 복사
+        if self.version == self.grid.version:
+            return False
+        with self.grid.write_lock:
+            version = self.grid.version
+            for name, _ in SHARED_LAYERS:
+                self.arrays[name][...] = getattr(self.grid, name)
+        self.version = version
+        return True
+
+    def close(self) -> None:
+        self.arrays.clear()
+        for segment in self.segments.values():
+            segment.close()
+            segment.unlink()
+        self.segments.clear()
+
+
+class BatchPlanner:
+    def __init__(self, grid: pf.Grid, config: pf.NavigationConfig, processes: Optional[int] = None):
+        self.grid = grid
+        self.config = config
+        self.processes = processes or min(DEFAULT_PROCESSES, os.cpu_count() or 1)
+        self.shared: Optional[SharedGrid] = None
+        self.worker: Optional[subprocess.Popen] = None
+        # 작업자 시작, 공유 메모리 갱신과 배치 실행이 겹치지 않도록 직렬화
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _start(self) -> None:
+        self.shared = SharedGrid(self.grid)
+        try:
+            self.worker = subprocess.Popen([sys.executable, WORKER_SCRIPT, str(self.processes)],
+                                           stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            self._send((self.shared.descriptor(), self.config))
+        except BaseException:
+            self._stop()
+            raise
+
+    def _send(self, message) -> None:
+        pickle.dump(message, self.worker.stdin)
+        self.worker.stdin.flush()
+
+    def plan_many(self, queries: Sequence[Tuple[Tuple[float, float], Tuple[float, float]]],
+                  time_budget: Optional[float] = None) -> List[Dict]:
+        with self._lock:
+            if self.worker is None:
+                self._start()
+            self.shared.sync()
+            tasks = [(tuple(start), tuple(goal), time_budget, self.shared.version) for start, goal in queries]
+            try:
+                self._send((tasks, max(1, len(tasks) // (4 * self.processes))))
+                status, payload = pickle.load(self.worker.stdout)
+            except (EOFError, OSError):
+                # 작업자 프로세스가 종료됨: 다음 요청 때 다시 시작
+                self._stop()
+                raise RuntimeError("Batch planning worker exited")
+            if status != "ok":
+                raise RuntimeError(f"Batch planning failed: {payload}")
+            return payload
+
+    def _stop(self) -> None:
+        if self.worker is not None:
+            # 표준 입력을 닫으면 작업자가 풀을 정리하고 종료
+            try:
+                self.worker.stdin.close()
+            except OSError:
+                pass
+            try:
+                self.worker.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.worker.kill()
+                self.worker.wait()
+            self.worker.stdout.close()
+            self.worker = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
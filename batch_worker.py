@@ -0,0 +1,84 @@
+import os
+import sys
+import pickle
+import multiprocessing as mp
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import path_finding as pf
+
+# 배치 경로 탐색 작업자 프로세스 (batch_planning.BatchPlanner가 python batch_worker.py <작업자 수>로 실행)
+# 프로세스 풀을 이 스크립트가 __main__인 프로세스에서 만들므로, 작업자는 시작/재시작 시 이 모듈만 다시 불러옴
+# (서버 시작 스크립트 app.py/serve.py와 감지 모델은 불러오지 않음)
+# 서버와는 표준 입출력으로 pickle 메시지를 주고받음
+#   서버 -> 작업자: (공유 메모리 descriptor, NavigationConfig) 한 번, 이후 배치마다 (tasks, chunksize)
+#   작업자 -> 서버: ("ok", 결과 목록) 또는 ("error", 메시지), 표준 입력이 닫히면 종료
+
+SHARED_LAYERS = (("obstacle", np.bool_), ("cost", np.float32))
+
+# 풀 작업자 전역 상태 (풀 initializer에서 설정)
+_worker_grid: Optional[pf.Grid] = None
+_worker_segments: List[shared_memory.SharedMemory] = []
+_worker_pathfinding: Optional[pf.Pathfinding] = None
+_worker_config: Optional[pf.NavigationConfig] = None
+
+
+def _attach(descriptor: Dict, config: pf.NavigationConfig) -> None:
+    global _worker_grid, _worker_pathfinding, _worker_config
+    grid = pf.Grid(**descriptor["grid"])
+    for name, dtype in SHARED_LAYERS:
+        segment = shared_memory.SharedMemory(name=descriptor["segments"][name])
+        # 공유 메모리는 서버가 만들고 해제: 이 프로세스 종료 시 자원 추적기가 지우지 않도록 등록 해제
+        resource_tracker.unregister(segment._name, "shared_memory")
+        _worker_segments.append(segment)
+        setattr(grid, name, np.ndarray((grid.width, grid.height), dtype=dtype, buffer=segment.buf))
+    _worker_grid = grid
+    _worker_pathfinding = pf.Pathfinding()
+    _worker_config = config
+
+
+def _plan_one(query: Tuple[Tuple[float, float], Tuple[float, float], Optional[float], int]) -> Dict:
+    start, goal, time_budget, version = query
+    # 공유 메모리 레이어는 서버가 직접 갱신하므로 서버의 지도 버전으로 탐색용 리스트 캐시를 무효화
+    _worker_grid.version = version
+    result = _worker_pathfinding.plan(start, goal, _worker_grid, time_budget)
+    if result is None:
+        return {"status": "ERROR", "message": "Start position is blocked", "waypoints": []}
+    waypoints = result.path
+    if _worker_config.PATH_SMOOTHING:
+        smoother = pf.PathSmoother(_worker_grid, _worker_config.SMOOTHING_COST_TOLERANCE)
+        waypoints = smoother.smooth(waypoints, _worker_config.WAYPOINT_SPACING)
+    return {
+        "status": "OK",
+        "waypoints": waypoints,
+        "reached": result.reached,
+        "epsilon": result.epsilon,
+        "timed_out": result.timed_out,
+        "expanded": result.expanded,
+    }
+
+
+def main() -> None:
+    processes = int(sys.argv[1])
+    requests = sys.stdin.buffer
+    # 표준 출력은 메시지 전용: 작업자의 print가 섞이지 않도록 fd 1을 표준 오류로 돌림
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    descriptor, config = pickle.load(requests)
+    method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+    with mp.get_context(method).Pool(processes=processes, initializer=_attach, initargs=(descriptor, config)) as pool:
+        while True:
+            try:
+                tasks, chunksize = pickle.load(requests)
+            except EOFError:
+                return
+            try:
+                reply = ("ok", pool.map(_plan_one, tasks, chunksize=chunksize))
+            except Exception as e:
+                reply = ("error", f"{type(e).__name__}: {e}")
+            pickle.dump(reply, replies)
+            replies.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import sys
+import json
+import math
+import time
+import itertools
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import firing as fire
+
+# 사격 통제 텔레메트리 재생 및 수렴 측정
+# - 기록된 shared_data 프레임(/info 페이로드) 시퀀스를 FireControlSession에 순서대로 넣고
+#   포탑(E/Q)과 포신(R/F) 명령을 설정한 선회 속도로 시뮬레이션하여 다음 프레임의 각도로 사용 (폐루프)
+# - 첫 프레임부터 FIRE까지 틱 수/게임 시간, 발사 시점 조준 오차, 틱당 계산 시간을 보고
+# - 허용 오차(MAX/MIN_TOLERANCE), 선회 속도, 리드 조준 여부 등을 조합하여 비교 (sweep)
+# 기록 파일 형식: 한 줄에 프레임 하나인 JSON Lines (utils.TelemetryRecorder), 또는 프레임 목록 JSON
+
+SLEW_COMMANDS = {"E": ("playerTurretX", 1.0), "Q": ("playerTurretX", -1.0),
+                 "R": ("playerTurretY", 1.0), "F": ("playerTurretY", -1.0)}
+
+# 세션에 적용할 수 있는 파라미터 (Initialize 상수) 외의 재생 설정 기본값
+REPLAY_DEFAULTS = {
+    "turret_rate": 30.0,  # 포탑 선회 속도 (도/초, 가중치 1 기준)
+    "barrel_rate": 10.0,  # 포신 고각 변경 속도 (도/초, 가중치 1 기준)
+    "dt": None,           # None이면 프레임의 time 차이 사용
+    "lead": True,         # 이동 표적 리드 조준
+}
+
+
+def load_recording(path: str) -> List[Dict]:
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def split_engagements(frames: Sequence[Dict], gap: float = 1.0) -> List[List[Dict]]:
+    # 게임 시간이 되돌아가거나 gap초 이상 끊기면 다른 교전으로 분리
+    sequences, current, last_time = [], [], None
+    for frame in frames:
+        t = frame.get("time", 0.0)
+        if current and (t < last_time or t - last_time > gap):
+            sequences.append(current)
+            current = []
+        current.append(frame)
+        last_time = t
+    if current:
+        sequences.append(current)
+    return sequences
+
+
+def synthetic_engagement(distance: float = 80.0, bearing_offset: float = 40.0, elevation_offset: float = -3.0,
+                         delta_h: float = 0.0, enemy_speed: float = 0.0, enemy_heading: float = 90.0,
+                         ticks: int = 300, dt: float = 0.1) -> List[Dict]:
+    # 정지한 전차에서 bearing_offset(도)만큼 돌아간 방향의 표적을 조준하는 시퀀스
+    frames = []
+    for i in range(ticks):
+        t = i * dt
+        vx = enemy_speed * math.sin(math.radians(enemy_heading)) * t
+        vz = enemy_speed * math.cos(math.radians(enemy_heading)) * t
+        enemy = {"x": distance * math.sin(math.radians(bearing_offset)) + vx, "y": delta_h,
+                 "z": distance * math.cos(math.radians(bearing_offset)) + vz}
+        frames.append({
+            "enemyPos": enemy,
+            "playerPos": {"x": 0.0, "y": 0.0, "z": 0.0},
+            "distance": math.hypot(enemy["x"], enemy["z"]),
+            "enemySpeed": enemy_speed,
+            "playerSpeed": 0.0,
+            "time": round(t + dt, 6),
+            "enemyBodyX": enemy_heading,
+            "playerTurretX": 0.0,
+            "playerTurretY": elevation_offset,
+        })
+    return frames
+
+
+def _make_session(params: Dict) -> fire.FireControlSession:
+    session = fire.FireControlSession()
+    for name, value in params.items():
+        if name not in REPLAY_DEFAULTS:
+            if not hasattr(fire.Initialize, name):
+                raise ValueError(f"Unknown fire-control parameter: {name}")
+            setattr(session.context, name, value)
+    # ToleranceCalculator는 생성 시 상수를 복사하므로 다시 생성
+    session.turret.tolerance_calculator = fire.ToleranceCalculator(session.context)
+    if not params.get("lead", REPLAY_DEFAULTS["lead"]):
+        session.turret.aiming_behavior.intercept_solver = None
+    return session
+
+
+def replay(frames: Sequence[Dict], params: Optional[Dict] = None) -> Dict:
+    # 하나의 교전 시퀀스를 재생하고 지표 반환
+    params = dict(REPLAY_DEFAULTS, **(params or {}))
+    session = _make_session(params)
+    turret = {"playerTurretX": float(frames[0]["playerTurretX"]), "playerTurretY": float(frames[0]["playerTurretY"])}
+    compute_times = []
+    fired_at = None
+    previous_time = None
+    solution = None
+    for tick, frame in enumerate(frames):
+        data = dict(frame, **turret)
+        if "distance" not in data:
+            data["distance"] = math.hypot(data["enemyPos"]["x"] - data["playerPos"]["x"],
+                                          data["enemyPos"]["z"] - data["playerPos"]["z"])
+        started = time.perf_counter()
+        result = session.update(data)
+        compute_times.append(time.perf_counter() - started)
+        solution = session.solution
+
+        dt = params["dt"] if params["dt"] is not None else \
+            (frame["time"] - previous_time if previous_time is not None else 0.0)
+        previous_time = frame["time"]
+        command, weight = (result if isinstance(result, tuple) else (result, 1.0))
+        if command == "FIRE":
+            fired_at = tick
+            break
+        if command in SLEW_COMMANDS:
+            # 다음 프레임의 포탑/포신 각도 (명령 가중치에 비례한 선회)
+            key, sign = SLEW_COMMANDS[command]
+            rate = params["turret_rate"] if key == "playerTurretX" else params["barrel_rate"]
+            step = params["dt"] if params["dt"] is not None else \
+                (frames[tick + 1]["time"] - frame["time"] if tick + 1 < len(frames) else dt)
+            turret[key] = (turret[key] + sign * rate * weight * step) % 360.0 if key == "playerTurretX" \
+                else turret[key] + sign * rate * weight * step
+
+    fired = fired_at is not None
+    heading_error = solution["heading_error"] if solution else None
+    barrel_error = solution["barrel_angle_error"] if solution else None
+    distance = solution["distance"] if solution else None
+    return {
+        "fired": fired,
+        "ticks_to_fire": fired_at + 1 if fired else None,
+        "time_to_fire": frames[fired_at]["time"] - frames[0]["time"] if fired else None,
+        "ticks": len(compute_times),
+        "heading_error_deg": math.degrees(heading_error) if heading_error is not None else None,
+        "barrel_error_deg": math.degrees(barrel_error) if barrel_error is not None else None,
+        # 마지막 해의 방위 오차를 표적 거리에서의 횡방향 빗나감 거리로 환산
+        "miss_m": abs(math.tan(heading_error)) * distance if heading_error is not None and distance else None,
+        "compute_us_mean": float(np.mean(compute_times)) * 1e6,
+        "compute_us_p95": float(np.percentile(compute_times, 95)) * 1e6,
+        "compute_us_max": float(np.max(compute_times)) * 1e6,
+    }
+
+
+def _mean(values: Iterable[Optional[float]]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return float(np.mean(values)) if values else None
+
+
+def sweep(sequences: Sequence[Sequence[Dict]], space: Dict[str, Sequence]) -> List[Dict]:
+    # 파라미터 조합마다 모든 시퀀스를 재생하여 요약 (발사율 높고 빠른 순)
+    names = list(space)
+    results = []
+    for values in itertools.product(*(space[name] for name in names)):
+        params = dict(zip(names, values))
+        runs = [replay(frames, params) for frames in sequences]
+        results.append({
+            "params": params,
+            "fire_rate": float(np.mean([r["fired"] for r in runs])),
+            "mean_ticks_to_fire": _mean(r["ticks_to_fire"] for r in runs),
+            "mean_time_to_fire": _mean(r["time_to_fire"] for r in runs),
+            "mean_abs_heading_error_deg": _mean(abs(r["heading_error_deg"]) for r in runs if r["fired"]),
+            "mean_abs_barrel_error_deg": _mean(abs(r["barrel_error_deg"]) for r in runs if r["fired"]),
+            "mean_miss_m": _mean(r["miss_m"] for r in runs if r["fired"]),
+            "compute_us_mean": _mean(r["compute_us_mean"] for r in runs),
+            "compute_us_p95": _mean(r["compute_us_p95"] for r in runs),
+        })
+    return sorted(results, key=lambda r: (-r["fire_rate"], r["mean_ticks_to_fire"] or math.inf))
+
+
+if __name__ == "__main__":
+    # 사용법: python fire_replay.py [기록.jsonl ...] (파일이 없으면 합성 교전 사용)
+    if len(sys.argv) > 1:
+        sequences = [seq for path in sys.argv[1:] for seq in split_engagements(load_recording(path))]
+    else:
+        sequences = [synthetic_engagement(distance=d, bearing_offset=b, enemy_speed=v)
+                     for d in (40.0, 80.0, 110.0) for b in (-60.0, 15.0, 90.0) for v in (0.0, 8.0)]
+    print(f"Sequences: {len(sequences)}")
+    ranked = sweep(sequences, {
+        "MAX_TOLERANCE": [0.01745329, 0.03490659],
+        "MIN_TOLERANCE": [0.00436332, 0.00872665],
+        "turret_rate": [20.0, 40.0],
+    })
+    for r in ranked:
+        print(f"fire={r['fire_rate']:.2f} ticks={r['mean_ticks_to_fire']} miss={r['mean_miss_m']} "
+              f"compute={r['compute_us_mean']:.1f}us p95={r['compute_us_p95']:.1f}us params={r['params']}")
@@ -1,6 +1,14 @@
+import os
+import json
 import math
 import time
-from utils import shared_data
+import bisect
+import threading
+import numpy as np
+import metrics
+
+# 사격 제원표 파일 (있으면 회귀식 대신 사용, 새 포탄/보정 데이터는 파일 교체만으로 적용)
+FIRING_TABLE_PATH = os.environ.get("FIRING_TABLE", "firing_table.json")
 
 class Vector:
     def __init__(self, x, y):
@@ -18,10 +26,12 @@ class Vector:
         return Vector(self.x / mag, self.y / mag)
 
 class Initialize:
-    EFFECTIVE_MAX_RANGE = 115.8  # Unit: meters
-    EFFECTIVE_MIN_RANGE = 21.002 # Unit: meters
+    # 유효 사거리는 사격 제원표의 거리 범위 (FiringTable.min_range / max_range)
     MAX_TOLERANCE = 0.01745329
     MIN_TOLERANCE = 0.00872665
+    SHELL_SPEED = 42.6           # Unit: m/s
+    ENEMY_SPEED_SCALE = 1.0      # enemySpeed 단위를 m/s로 바꾸는 배율 (km/h면 1 / 3.6)
+    LEAD_ITERATIONS = 4          # 리드 지점 반복 계산 최대 횟수
     
 
     def __init__(self, data=None):
@@ -43,16 +53,206 @@ class Initialize:
             "getRise": "R", "getFall": "F", "getFire": "FIRE"
         }
 
+# 사격 제원표: (거리, 높이 차이) 격자에 포신 각도(라디안)를 미리 계산해 두고 쌍선형 보간으로 조회
+# 거리가 표 범위를 벗어나면 사거리 밖(None/nan), 높이 차이는 표 범위로 제한
+class FiringTable:
+    def __init__(self, distances, delta_hs, angles):
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.delta_hs = np.asarray(delta_hs, dtype=np.float64)
+        self.angles = np.asarray(angles, dtype=np.float64)
+        if self.angles.shape != (len(self.distances), len(self.delta_hs)):
+            raise ValueError(f"Angle table shape {self.angles.shape} does not match axes "
+                             f"({len(self.distances)}, {len(self.delta_hs)})")
+        if len(self.distances) < 2 or len(self.delta_hs) < 2:
+            raise ValueError("Firing table needs at least two samples per axis")
+        if np.any(np.diff(self.distances) <= 0) or np.any(np.diff(self.delta_hs) <= 0):
+            raise ValueError("Firing table axes must be strictly increasing")
+        # 단일 조회는 파이썬 리스트에서 이분 탐색 (numpy 호출 오버헤드 회피)
+        self._distance_list = self.distances.tolist()
+        self._delta_h_list = self.delta_hs.tolist()
+        self._angle_rows = self.angles.tolist()
+        # 축 간격이 일정하면 이분 탐색 대신 나눗셈으로 칸 번호 계산
+        self._distance_step = _uniform_step(self.distances)
+        self._delta_h_step = _uniform_step(self.delta_hs)
+
+    @property
+    def min_range(self) -> float:
+        return self._distance_list[0]
+
+    @property
+    def max_range(self) -> float:
+        return self._distance_list[-1]
+
+    def in_range(self, distance) -> bool:
+        return self._distance_list[0] <= distance <= self._distance_list[-1]
+
+    @classmethod
+    def from_regression(cls, min_range=21.002, max_range=115.8, distance_step=0.25, delta_h_limit=40.0,
+                        delta_h_step=0.5):
+        # 기존 회귀식(역함수) + 높이 차이 보정으로 표 생성, 기본 거리 범위는 회귀식의 유효 사거리 (m)
+        distances = np.linspace(min_range, max_range, int(round((max_range - min_range) / distance_step)) + 1)
+        delta_hs = np.linspace(-delta_h_limit, delta_h_limit, int(round(2 * delta_h_limit / delta_h_step)) + 1)
+        return cls(distances, delta_hs, regression_barrel_angle(distances[:, None], delta_hs[None, :]))
+
+    @classmethod
+    def load(cls, path):
+        # 보정 데이터: {"distances": [...], "delta_h": [...], "angles_deg": [[...], ...]}
+        # angles_deg[i][j]는 distances[i], delta_h[j]에서의 포신 각도(도)
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["distances"], data["delta_h"], np.radians(np.asarray(data["angles_deg"], dtype=np.float64)))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "distances": self._distance_list,
+                "delta_h": self._delta_h_list,
+                "angles_deg": np.degrees(self.angles).tolist()
+            }, f)
+
+    def lookup(self, distance, delta_h):
+        # 단일 조회, 사거리 밖이면 None
+        distances, delta_hs = self._distance_list, self._delta_h_list
+        if not distances[0] <= distance <= distances[-1]:
+            return None
+        delta_h = min(max(delta_h, delta_hs[0]), delta_hs[-1])
+        if self._distance_step:
+            i = min(int((distance - distances[0]) / self._distance_step), len(distances) - 2)
+        else:
+            i = min(bisect.bisect_right(distances, distance) - 1, len(distances) - 2)
+        if self._delta_h_step:
+            j = min(int((delta_h - delta_hs[0]) / self._delta_h_step), len(delta_hs) - 2)
+        else:
+            j = min(bisect.bisect_right(delta_hs, delta_h) - 1, len(delta_hs) - 2)
+        u = (distance - distances[i]) / (distances[i + 1] - distances[i])
+        v = (delta_h - delta_hs[j]) / (delta_hs[j + 1] - delta_hs[j])
+        row0, row1 = self._angle_rows[i], self._angle_rows[i + 1]
+        return ((1 - u) * ((1 - v) * row0[j] + v * row0[j + 1]) +
+                u * ((1 - v) * row1[j] + v * row1[j + 1]))
+
+    def lookup_many(self, distances, delta_hs):
+        # 배열 조회 (브로드캐스트), 사거리 밖은 nan
+        distances = np.asarray(distances, dtype=np.float64)
+        delta_hs = np.clip(np.asarray(delta_hs, dtype=np.float64), self.delta_hs[0], self.delta_hs[-1])
+        distances, delta_hs = np.broadcast_arrays(distances, delta_hs)
+        i = np.clip(np.searchsorted(self.distances, distances, side="right") - 1, 0, len(self.distances) - 2)
+        j = np.clip(np.searchsorted(self.delta_hs, delta_hs, side="right") - 1, 0, len(self.delta_hs) - 2)
+        u = (distances - self.distances[i]) / (self.distances[i + 1] - self.distances[i])
+        v = (delta_hs - self.delta_hs[j]) / (self.delta_hs[j + 1] - self.delta_hs[j])
+        a = self.angles
+        result = ((1 - u) * ((1 - v) * a[i, j] + v * a[i, j + 1]) +
+                  u * ((1 - v) * a[i + 1, j] + v * a[i + 1, j + 1]))
+        in_range = (distances >= self.distances[0]) & (distances <= self.distances[-1])
+        return np.where(in_range, result, np.nan)
+
+
+def _uniform_step(axis):
+    steps = np.diff(axis)
+    return float(steps[0]) if np.allclose(steps, steps[0], rtol=1e-9, atol=1e-12) else None
+
+
+def regression_barrel_angle(distance, delta_h):
+    # Ballistics의 회귀식 계산을 배열로 수행 (라디안)
+    discriminant = 1.492 * np.asarray(distance, dtype=np.float64) - 24.564784
+    theta = np.radians((-5.914 + np.sqrt(np.maximum(discriminant, 0.0))) / 0.746)
+    return np.arctan(np.tan(theta) + delta_h / distance)
+
+
+_firing_table = None
+
+
+def get_firing_table():
+    # 기본 사격 제원표 (FIRING_TABLE_PATH 파일이 있으면 로드, 없으면 회귀식으로 생성), 최초 호출 시 한 번만 생성
+    global _firing_table
+    if _firing_table is None:
+        if os.path.exists(FIRING_TABLE_PATH):
+            _firing_table = FiringTable.load(FIRING_TABLE_PATH)
+        else:
+            _firing_table = FiringTable.from_regression()
+    return _firing_table
+
+
+# 이동 표적 리드(요격) 계산
+# 비행 시간 t = 수평 거리 / (탄속 * cos(포신 각도)), 표적이 t 동안 이동한 지점을 다시 조준하는 것을
+# 고정 횟수(max_iterations) 안에서 반복 (수렴하면 조기 종료)
+# 표적 방향은 enemyBodyX(도, z축 기준 x축 방향으로 증가하는 각도), 속도는 enemySpeed * speed_scale
+class InterceptSolver:
+    def __init__(self, table=None, shell_speed=Initialize.SHELL_SPEED, speed_scale=Initialize.ENEMY_SPEED_SCALE,
+                 max_iterations=Initialize.LEAD_ITERATIONS, tolerance=1e-3):
+        self.table = table or get_firing_table()
+        self.shell_speed = shell_speed
+        self.speed_scale = speed_scale
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance  # 비행 시간 수렴 기준 (초)
+
+    def _time_of_flight(self, distance, delta_h):
+        angle = self.table.lookup(distance, delta_h)
+        if angle is None:
+            return None
+        return distance / (self.shell_speed * math.cos(angle))
+
+    def solve(self, player_pos, enemy_pos, enemy_speed, enemy_heading):
+        # 리드 조준 지점과 비행 시간, 사거리 밖이면 None
+        velocity = enemy_speed * self.speed_scale
+        vx = velocity * math.sin(math.radians(enemy_heading))
+        vz = velocity * math.cos(math.radians(enemy_heading))
+        delta_h = enemy_pos["y"] - player_pos["y"]
+        aim_x, aim_z = enemy_pos["x"], enemy_pos["z"]
+        distance = math.hypot(aim_x - player_pos["x"], aim_z - player_pos["z"])
+        tof = self._time_of_flight(distance, delta_h)
+        if tof is None:
+            return None
+        converged = velocity == 0
+        iterations = 0
+        while not converged and iterations < self.max_iterations:
+            iterations += 1
+            aim_x = enemy_pos["x"] + vx * tof
+            aim_z = enemy_pos["z"] + vz * tof
+            distance = math.hypot(aim_x - player_pos["x"], aim_z - player_pos["z"])
+            next_tof = self._time_of_flight(distance, delta_h)
+            if next_tof is None:
+                return None
+            converged = abs(next_tof - tof) < self.tolerance
+            tof = next_tof
+        return {"x": aim_x, "y": enemy_pos["y"], "z": aim_z, "distance": distance,
+                "time_of_flight": tof, "iterations": iterations, "converged": converged}
+
+    def solve_many(self, player_pos, enemy_xyz, enemy_speeds, enemy_headings):
+        # 여러 표적을 배열로 한 번에 계산 (항상 max_iterations회 반복)
+        # enemy_xyz: (n, 3), 반환: 조준 지점 (n, 3), 수평 거리 (n,), 비행 시간 (n,) / 사거리 밖은 nan
+        enemy_xyz = np.asarray(enemy_xyz, dtype=np.float64).reshape(-1, 3)
+        velocity = np.asarray(enemy_speeds, dtype=np.float64) * self.speed_scale
+        heading = np.radians(np.asarray(enemy_headings, dtype=np.float64))
+        v = np.stack([velocity * np.sin(heading), velocity * np.cos(heading)], axis=1)
+        origin = np.array([player_pos["x"], player_pos["z"]], dtype=np.float64)
+        delta_h = enemy_xyz[:, 1] - player_pos["y"]
+        start = enemy_xyz[:, [0, 2]]
+
+        def time_of_flight(distance):
+            return distance / (self.shell_speed * np.cos(self.table.lookup_many(distance, delta_h)))
+
+        aim = start
+        distance = np.hypot(*(aim - origin).T)
+        tof = time_of_flight(distance)
+        for _ in range(self.max_iterations):
+            aim = start + v * tof[:, None]
+            distance = np.hypot(*(aim - origin).T)
+            tof = time_of_flight(distance)
+        points = np.column_stack([aim[:, 0], enemy_xyz[:, 1], aim[:, 1]])
+        return points, distance, tof
+
+
 # 평면에서의 탄속 고려려 (42.6 m/s)
 class Ballistics:
-    def __init__(self, context):
+    def __init__(self, context, table=None):
         self.context = context
+        self.table = table or get_firing_table()
 
     def _calculation_of_barrel_angle_by_distance(self):
         # 원 회귀식; y=0.373x2+5.914x+41.24; y: distance, x: barrel_degree
         # 적과의 거리가 사정거리 내인지 확인할 것
         distance = self.context.shared_data["distance"]
-        if self.context.EFFECTIVE_MIN_RANGE <= distance <= self.context.EFFECTIVE_MAX_RANGE:
+        if self.table.in_range(distance) and 1.492 * distance - 24.564784 >= 0:
             # 포신 각도를 회귀식을 통해 구하기기
             # if not (20.995 <= distance <= 137.68):
             #     raise ValueError("Distance is outside the inverse function's domain [20.995, 137.68].")
@@ -79,15 +279,32 @@ class Ballistics:
             return 0, 0
             # raise ValueError("Distance exceeds effective range")
 
-    def _calculation_of_barrel_angle_by_distance_with_delta_h(self):
+    def _calculation_of_barrel_angle_by_distance_with_delta_h(self, distance=None):
+        # 사격 제원표에서 (거리, 높이 차이)에 대한 포신 각도를 쌍선형 보간으로 조회
+        # distance를 주면 (리드 조준 등) 측정 거리 대신 사용
+        if distance is None:
+            distance = self.context.shared_data["distance"]
+        delta_h = self.context.shared_data["enemyPos"]["y"] - self.context.shared_data["playerPos"]["y"]
+        # 사거리(표의 거리 범위) 밖이면 None
+        barrel_angle = self.table.lookup(distance, delta_h)
+        if barrel_angle is None:
+            return 0, 0
+
+        # Calculate barrel angle error
+        current_turret_angle_rad = self.context.shared_data["playerTurretY"] * math.pi / 180
+        barrel_angle_error = current_turret_angle_rad - barrel_angle
+        barrel_angle_error = math.atan2(math.sin(barrel_angle_error), math.cos(barrel_angle_error))
+        return barrel_angle, barrel_angle_error
+
+    def _calculation_of_barrel_angle_by_regression_with_delta_h(self):
         # 원 회귀식: theta = 0.373x^2 + 5.914x + 41.24 (theta: barrel angle in degrees, x: distance)
-        # 높이 차이 delta_h를 고려한 새로운 포신 각도 계산
+        # 높이 차이 delta_h를 고려한 새로운 포신 각도 계산 (사격 제원표 생성/검증용 직접 계산)
         # 적과의 거리가 사정거리 내인지 확인
         distance = self.context.shared_data["distance"]
         delta_h = self.context.shared_data["enemyPos"]["y"] - self.context.shared_data["playerPos"]["y"]  # delta_h가 없으면 0으로 설정
         self.barrel_angle, self.barrel_angle_error = self._calculation_of_barrel_angle_by_distance()
         
-        if self.context.EFFECTIVE_MIN_RANGE <= distance <= self.context.EFFECTIVE_MAX_RANGE:
+        if self.table.in_range(distance):
             # 포신 각도를 회귀식과 delta_h를 통해 구하기
             theta_old_rad = self.barrel_angle
             
@@ -115,14 +332,27 @@ class Ballistics:
             # raise ValueError("Distance exceeds effective range")
 
 class AimingBehavior:
-    def __init__(self, context):
+    def __init__(self, context, table=None, lead=True):
         self.context = context
-        self.ballistics = Ballistics(context)
+        self.ballistics = Ballistics(context, table)
+        # 표적이 움직이면 현재 위치 대신 리드 지점을 조준
+        self.intercept_solver = InterceptSolver(self.ballistics.table) if lead else None
+        self.intercept = None
 
-    def _calculate_turret_angle(self):
+    def _solve_intercept(self):
+        data = self.context.shared_data
+        self.intercept = None
+        if self.intercept_solver is None or not data.get("enemySpeed"):
+            return None
+        self.intercept = self.intercept_solver.solve(data["playerPos"], data["enemyPos"], data["enemySpeed"],
+                                                     data.get("enemyBodyX", 0.0))
+        return self.intercept
+
+    def _calculate_turret_angle(self, aim_pos=None):
+        aim_pos = aim_pos or self.context.shared_data["enemyPos"]
         goal_vector = Vector(
-            self.context.shared_data["enemyPos"]["x"] - self.context.shared_data["playerPos"]["x"],
-            self.context.shared_data["enemyPos"]["z"] - self.context.shared_data["playerPos"]["z"]
+            aim_pos["x"] - self.context.shared_data["playerPos"]["x"],
+            aim_pos["z"] - self.context.shared_data["playerPos"]["z"]
         )
         # print(goal_vector.x, goal_vector.y)
         goal_vector = goal_vector.normalize()
@@ -139,22 +369,37 @@ class AimingBehavior:
         return goal_vector, heading_error
 
     def control_information(self):
-        goal_vector, heading_error = self._calculate_turret_angle()
-        barrel_angle, barrel_angle_error = self.ballistics._calculation_of_barrel_angle_by_distance_with_delta_h()
+        intercept = self._solve_intercept()
+        if intercept is None:
+            goal_vector, heading_error = self._calculate_turret_angle()
+            barrel_angle, barrel_angle_error = self.ballistics._calculation_of_barrel_angle_by_distance_with_delta_h()
+        else:
+            # 측정 거리에 리드 지점까지 늘어나거나 줄어든 거리만큼 보정
+            data = self.context.shared_data
+            current = math.hypot(data["enemyPos"]["x"] - data["playerPos"]["x"],
+                                 data["enemyPos"]["z"] - data["playerPos"]["z"])
+            distance = data["distance"] + intercept["distance"] - current
+            goal_vector, heading_error = self._calculate_turret_angle(intercept)
+            barrel_angle, barrel_angle_error = self.ballistics._calculation_of_barrel_angle_by_distance_with_delta_h(distance)
         return goal_vector, heading_error, barrel_angle, -barrel_angle_error
 
 class TurretControl:
-    def __init__(self, context):
+    def __init__(self, context, table=None):
         self.context = context
         self.previous_play_time = 0
-        self.aiming_behavior = AimingBehavior(context)
-        self.tolerance_calculator = ToleranceCalculator(context)
-        self.tolerance = self.tolerance_calculator.get_tolerance()
-        self.target_vector, self.heading_error, self.barrel_angle, self.barrel_angle_error = self.aiming_behavior.control_information()
+        self.aiming_behavior = AimingBehavior(context, table)
+        self.table = self.aiming_behavior.ballistics.table
+        self.tolerance_calculator = ToleranceCalculator(context, self.table)
+        # 조준 해는 normal_control에서 시간이 진행했을 때만 계산
+        self.tolerance = None
+        self.target_vector, self.heading_error, self.barrel_angle, self.barrel_angle_error = None, 0.0, 0.0, 0.0
 
     def normal_control(self):
             # print(f"⏰ Previous Time: {self.previous_play_time}, Current Time: {self.context.shared_data['time']}")
             if self.previous_play_time < self.context.shared_data["time"]:
+                # 같은 시각에는 다시 계산하지 않음 (명령을 반환하는 경우에도 계산한 시각을 기록)
+                self.previous_play_time = self.context.shared_data["time"]
+                self.tolerance = self.tolerance_calculator.get_tolerance(self.context.shared_data.get("distance"))
                 self.target_vector, self.heading_error, self.barrel_angle, self.barrel_angle_error = self.aiming_behavior.control_information()
                 # print(f"🔄 Updated - Heading Error: {self.heading_error}, Barrel Angle Error: {self.barrel_angle_error}")
                 turret_weight = min(max(abs(self.heading_error) / math.pi, 0.1), 1)
@@ -163,16 +408,9 @@ class TurretControl:
                 if abs(self.heading_error) > self.tolerance:
                     direction = "getRight" if self.heading_error > 0 else "getLeft"
                     # print(f"🛠️ Command: {direction}, Weight: {turret_weight}")
-                    # 시뮬레이션: 방향 업데이트 (예: 1도/초 회전)
-                    rotation_speed = 1.0  # 도/초
-                    if direction == "getLeft":
-                        self.context.shared_data["playerTurretX"] -= rotation_speed
-                    else:
-                        self.context.shared_data["playerTurretX"] += rotation_speed
-                    shared_data.set_data(self.context.shared_data)  # 이제 shared_data 사용 가능
+                    # 포탑 각도는 다음 텔레메트리로 갱신됨 (읽기 전용 스냅샷은 수정하지 않음)
                     return self.context.input_key_value[direction], turret_weight
-                elif abs(self.heading_error) <= self.tolerance and self.context.EFFECTIVE_MIN_RANGE <= \
-                    self.context.shared_data["distance"] <= self.context.EFFECTIVE_MAX_RANGE:
+                elif abs(self.heading_error) <= self.tolerance and self.table.in_range(self.context.shared_data["distance"]):
                     if abs(self.barrel_angle_error) > self.tolerance:
                         direction = "getRise" if self.barrel_angle_error > 0 else "getFall"
                         # print(f"🛠️ Command: {direction}, Weight: {barrel_weight}")
@@ -181,18 +419,18 @@ class TurretControl:
                         direction = "getFire"
                         # print(f"🛠️ Command: {direction}")
                         return self.context.input_key_value[direction]
-                self.previous_play_time = self.context.shared_data["time"]
             # print("⏭️ No update, returning None")
             return None
 
 class ToleranceCalculator:
-    def __init__(self, context):
+    def __init__(self, context, table=None):
         self.context = context
+        table = table or get_firing_table()
         self.distance = self.context.shared_data.get("distance")  # 안전한 get 사용
         self.max_tolerance = self.context.MAX_TOLERANCE  # 0.05235988
         self.min_tolerance = self.context.MIN_TOLERANCE  # 0.01745329
-        self.max_distance = self.context.EFFECTIVE_MAX_RANGE  # 115.8
-        self.min_distance = self.context.EFFECTIVE_MIN_RANGE  # 21.002
+        self.max_distance = table.max_range  # 사격 제원표의 거리 범위 (기본 115.8)
+        self.min_distance = table.min_range  # 21.002
 
     def _calculate_tolerance(self, distance):
         if distance < 0:
@@ -211,9 +449,52 @@ class ToleranceCalculator:
         # print(f"🛠️ Calculated Tolerance: {tolerance}")
         return tolerance
 
-    def get_tolerance(self):
+    def get_tolerance(self, distance=None):
+        if distance is not None:
+            self.distance = distance
         if self.distance is None:
             raise KeyError("Distance key not found in shared_data")
         if not isinstance(self.distance, (int, float)):
             raise ValueError("Distance must be a number")
         return self._calculate_tolerance(self.distance)
+
+
+# 전차별 사격 통제 세션: 조준 객체와 상태를 틱 간에 유지하고
+# time이 진행한 경우에만 다시 계산 (같은 시각의 요청은 마지막 명령 재사용), 마지막 해(solution)는 다른 요청에서 재사용
+class FireControlSession:
+    def __init__(self, table=None):
+        self.context = Initialize()
+        self.turret = TurretControl(self.context, table)
+        self.solution = None  # 마지막으로 계산한 조준 해
+        self._result = None
+        self._lock = threading.Lock()
+
+    def update(self, data):
+        # normal_control과 같은 형식의 결과 반환 (명령, 가중치) / 명령 / None
+        with metrics.timer("fire_control"), self._lock:
+            if data["time"] < self.turret.previous_play_time:
+                # 새 게임이 시작되어 시간이 되돌아간 경우
+                self.turret.previous_play_time = 0
+            elif data["time"] == self.turret.previous_play_time:
+                return self._result
+            self.context.shared_data = data
+            result = self.turret.normal_control()
+            self._result = result
+            turret = self.turret
+            self.solution = {
+                "time": data["time"],
+                "distance": data.get("distance"),
+                "heading_error": turret.heading_error,
+                "barrel_angle": turret.barrel_angle,
+                "barrel_angle_error": turret.barrel_angle_error,
+                "tolerance": turret.tolerance,
+                "command": result[0] if isinstance(result, tuple) else result,
+                "lead": turret.aiming_behavior.intercept,
+            }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self.turret.previous_play_time = 0
+            self.solution = None
+            self._result = None
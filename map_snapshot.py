@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+import path_finding as pf
+
+# 지도 스냅샷 (재시작 시 장애물 재동기화 없이 바로 경로 탐색 가능하도록)
+# 디렉터리 구성:
+#   meta.json       - 형식 버전, Grid 생성 인자, 레이어 목록, clean (레이어와 장애물 목록이 함께 기록 완료되었는지)
+#   <layer>.npy     - 격자 레이어, 시작 시 mmap(copy-on-write)으로 열어 Grid 배열로 그대로 사용
+#                     (실행 중 변경은 파일에 바로 반영되지 않고 flush 때만 기록)
+#   obstacles.json  - 원래 장애물 사각형 목록 (공간 인덱스는 로드 시 재구성)
+# flush 순서: meta(clean=False) -> 레이어 -> obstacles.json -> meta(clean=True)
+# 시작 시 clean이 아니면 (기록 도중 종료) 레이어를 버리고 obstacles.json으로 다시 계산
+
+SNAPSHOT_FORMAT = 1
+LAYERS = ("coverage", "obstacle", "distance", "cost")
+
+
+class MapSnapshot:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.grid_kwargs = None
+        self.flushed_version = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _write_json(self, name: str, payload) -> None:
+        # 임시 파일에 쓴 뒤 교체하여 중간에 죽어도 깨진 파일이 남지 않도록 함
+        tmp_path = self._path(name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self._path(name))
+
+    def _write_meta(self, clean: bool) -> None:
+        self._write_json("meta.json", {
+            "format": SNAPSHOT_FORMAT,
+            "grid": _normalize_kwargs(self.grid_kwargs),
+            "layers": list(LAYERS),
+            "clean": clean,
+            "saved_at": time.time()
+        })
+
+    def read_meta(self):
+        try:
+            with open(self._path("meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("format") != SNAPSHOT_FORMAT:
+            return None
+        return meta
+
+    def open(self, **grid_kwargs) -> pf.Grid:
+        # 같은 Grid 설정으로 기록 완료된 스냅샷이 있으면 mmap으로 열고,
+        # 기록이 끝나지 않은 스냅샷이면 장애물 목록으로 다시 계산, 없으면 새 Grid를 만들어 저장 후 연다
+        self.grid_kwargs = grid_kwargs
+        meta = self.read_meta()
+        if meta is not None and meta.get("grid") == _normalize_kwargs(grid_kwargs):
+            if meta.get("clean"):
+                try:
+                    return self.load(meta)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Map snapshot is corrupted, rebuilding: {e}")
+            else:
+                print("Map snapshot was not flushed completely, rebuilding from obstacles")
+            grid = self.rebuild(grid_kwargs)
+        else:
+            grid = pf.Grid(**grid_kwargs)
+        self.save(grid)
+        return self.load(self.read_meta())
+
+    def load(self, meta) -> pf.Grid:
+        grid = pf.Grid(**meta["grid"])
+        for name in LAYERS:
+            layer = np.load(self._path(f"{name}.npy"), mmap_mode="c")
+            if layer.shape != (grid.width, grid.height):
+                raise ValueError(f"Layer {name} has shape {layer.shape}")
+            setattr(grid, name, layer)
+        with open(self._path("obstacles.json")) as f:
+            for rect in json.load(f):
+                grid.obstacles.add(rect)
+        self.flushed_version = grid.version
+        return grid
+
+    def rebuild(self, grid_kwargs) -> pf.Grid:
+        # 레이어를 신뢰할 수 없을 때 저장된 장애물 목록으로 격자/거리/비용을 다시 계산
+        grid = pf.Grid(**grid_kwargs)
+        try:
+            with open(self._path("obstacles.json")) as f:
+                rects = json.load(f)
+        except (OSError, ValueError):
+            rects = []
+        for rect in rects:
+            grid.set_obstacle(rect["x_min"], rect["x_max"], rect["z_min"], rect["z_max"], rect.get("id"))
+        return grid
+
+    def save(self, grid: pf.Grid) -> None:
+        # 레이어와 장애물 목록을 같은 시점의 상태로 복사한 뒤 기록 (복사 중에는 지도 갱신 대기)
+        os.makedirs(self.directory, exist_ok=True)
+        with grid.write_lock:
+            version = grid.version
+            layers = {name: np.array(getattr(grid, name)) for name in LAYERS}
+            obstacles = grid.original_obstacles
+        with self._lock:
+            self._write_meta(clean=False)
+            for name, layer in layers.items():
+                tmp_path = self._path(f"{name}.tmp.npy")
+                np.save(tmp_path, layer)
+                os.replace(tmp_path, self._path(f"{name}.npy"))
+            self._write_json("obstacles.json", obstacles)
+            self._write_meta(clean=True)
+            self.flushed_version = version
+
+    def flush(self, grid: pf.Grid, force: bool = False) -> bool:
+        if not force and grid.version == self.flushed_version:
+            return False
+        self.save(grid)
+        return True
+
+    def start_autoflush(self, grid: pf.Grid, interval: float = 5.0) -> None:
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.flush(grid)
+                except OSError as e:
+                    print(f"Map snapshot flush failed: {e}")
+
+        self._thread = threading.Thread(target=run, name="map-snapshot", daemon=True)
+        self._thread.start()
+
+    def close(self, grid: pf.Grid) -> None:
+        self._stop.set()
+        self.flush(grid)
+
+
+def _normalize_kwargs(grid_kwargs):
+    # JSON 왕복 후에도 비교 가능하도록 튜플을 리스트로 변환
+    return json.loads(json.dumps(grid_kwargs))
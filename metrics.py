@@ -0,0 +1,183 @@
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 단계별 지연 시간 / 요청 수 / 상태 값 수집 및 Prometheus 텍스트 형식 출력 (/metrics)
+# - Histogram: 고정 구간(bucket) 누적 개수, 관측 한 번은 이분 탐색 + 잠금 하나
+# - Counter: 단조 증가 값 (이름은 _total로 끝나야 함, HELP/TYPE와 표본이 같은 이름), Gauge: 설정 값 또는 출력 시점에 호출하는 함수
+# - 같은 이름의 지표는 label 값 조합마다 하나씩 생성 (예: stage="find_path")
+# 단계 시간 측정: with metrics.timer("find_path"): ...
+
+# 초 단위 지연 시간 구간 (0.1ms ~ 5s)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 마지막 칸은 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    def __init__(self, function: Optional[Callable[[], float]] = None):
+        self.value = 0.0
+        self.function = function
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def read(self) -> Optional[float]:
+        if self.function is None:
+            return self.value
+        try:
+            return float(self.function())
+        except Exception:
+            # 출력 시점에 값을 읽을 수 없으면 (예: 아직 초기화 전) 생략
+            return None
+
+
+class Family:
+    def __init__(self, name: str, kind: str, help_text: str, label_names: Sequence[str], factory: Callable):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.factory = factory
+        self.children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        child = self.children.get(key)
+        if child is None:
+            with self._lock:
+                child = self.children.setdefault(key, self.factory())
+        return child
+
+
+class Registry:
+    def __init__(self):
+        self.families: Dict[str, Family] = {}
+        self._lock = threading.Lock()
+
+    def _family(self, name: str, kind: str, help_text: str, label_names: Sequence[str], factory: Callable) -> Family:
+        with self._lock:
+            family = self.families.get(name)
+            if family is None:
+                family = self.families[name] = Family(name, kind, help_text, label_names, factory)
+            elif family.kind != kind:
+                raise ValueError(f"Metric {name} already registered as {family.kind}")
+            return family
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Family:
+        if not name.endswith("_total"):
+            raise ValueError(f"Counter name must end with _total: {name}")
+        return self._family(name, "counter", help_text, labels, Counter)
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Family:
+        return self._family(name, "histogram", help_text, labels, lambda: Histogram(buckets))
+
+    def gauge(self, name: str, help_text: str, function: Optional[Callable[[], float]] = None,
+              labels: Sequence[str] = ()) -> Family:
+        return self._family(name, "gauge", help_text, labels, lambda: Gauge(function))
+
+    def render(self) -> str:
+        lines = []
+        for family in list(self.families.values()):
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for key, child in list(family.children.items()):
+                labels = list(zip(family.label_names, key))
+                if family.kind == "histogram":
+                    counts, total, count = child.samples()
+                    cumulative = 0
+                    for bound, n in zip(child.buckets + (float("inf"),), counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{family.name}_bucket{_labels(labels + [('le', le)])} {cumulative}")
+                    lines.append(f"{family.name}_sum{_labels(labels)} {total}")
+                    lines.append(f"{family.name}_count{_labels(labels)} {count}")
+                elif family.kind == "counter":
+                    lines.append(f"{family.name}{_labels(labels)} {child.value}")
+                else:
+                    value = child.read()
+                    if value is not None:
+                        lines.append(f"{family.name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("tank_stage_seconds", "Time spent per processing stage", ("stage",))
+STAGE_ERRORS = REGISTRY.counter("tank_stage_errors_total", "Stage executions that raised", ("stage",))
+REQUEST_SECONDS = REGISTRY.histogram("tank_http_request_seconds", "HTTP request latency per route", ("route",))
+REQUESTS = REGISTRY.counter("tank_http_requests_total", "HTTP requests per route and status", ("route", "status"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@contextmanager
+def timer(stage: str) -> Iterator[None]:
+    histogram = STAGE_SECONDS.labels(stage=stage)
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage=stage).inc()
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - started)
+
+
+def timed(stage: str):
+    # 함수 전체를 timer(stage)로 감싸는 데코레이터
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def gauge(name: str, help_text: str, function: Callable[[], float]) -> None:
+    # 출력 시점에 function()을 호출하여 값을 읽는 상태 지표 등록
+    REGISTRY.gauge(name, help_text, function).labels()
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,287 @@
+import math
+import time
+import itertools
+import dataclasses
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import path_finding as pf
+
+# NavigationConfig 튜닝용 오프라인 시뮬레이터
+# - NavigationController의 경로 추종(투영/lookahead), 조향, 속도, 명령 가중치 계산을
+#   여러 에피소드에 대해 NumPy 배열 연산으로 한 번에 수행
+# - 에피소드마다 다른 설정을 줄 수 있어 여러 설정을 한 배치로 비교 가능 (격자/무작위 탐색)
+# - 명령 선택은 시드를 지정한 난수 생성기로 수행하여 같은 시드면 같은 결과
+
+COMMANDS = ("D", "A", "W", "S")
+
+# 설정 탐색 시 값으로 다룰 수 있는 필드 (WEIGHT_FACTORS는 "WEIGHT_FACTORS.W"처럼 지정)
+TUNABLE_FIELDS = ("TOLERANCE", "LOOKAHEAD_MIN", "LOOKAHEAD_MAX", "HEADING_SMOOTHING", "STEERING_SMOOTHING",
+                  "SLOW_RADIUS", "MAX_SPEED", "MIN_SPEED", "SPEED_FACTOR", "TRACKING_WINDOW")
+
+
+# 운동학적 전차 모델: W/S는 전진/후진 목표 속도, A/D는 제자리 선회
+# 선택된 명령의 가중치(0~1로 제한)를 조작량으로 사용, 속도는 time_constant로 1차 지연
+@dataclass
+class TankModel:
+    max_forward_speed: float = 10.0  # m/s
+    max_reverse_speed: float = 4.0   # m/s
+    turn_rate: float = 1.0           # rad/s
+    time_constant: float = 0.5       # 속도 응답 시간 상수 (초)
+
+
+@dataclass
+class SimulationSettings:
+    dt: float = 0.1                 # get_move 호출 간격 (초)
+    max_time: float = 300.0         # 에피소드 최대 시간 (초), 넘으면 실패
+    start_noise: float = 2.0        # 시작 위치 무작위 오차 (미터)
+    heading_noise: float = 0.3      # 시작 방향 무작위 오차 (라디안)
+    failure_penalty: float = 2.0    # 실패 에피소드의 도착 시간을 max_time * failure_penalty로 계산
+    deviation_weight: float = 1.0   # 점수 = 평균 도착 시간 + deviation_weight * 평균 경로 이탈
+
+
+def _config_arrays(configs: Sequence[pf.NavigationConfig], repeat: int) -> Dict[str, np.ndarray]:
+    # 설정 목록을 에피소드별 파라미터 배열로 변환 (설정마다 repeat개 에피소드)
+    arrays = {name: np.repeat([float(getattr(c, name)) for c in configs], repeat) for name in TUNABLE_FIELDS}
+    for cmd in COMMANDS:
+        arrays["WEIGHT_" + cmd] = np.repeat([float(c.WEIGHT_FACTORS[cmd]) for c in configs], repeat)
+    return arrays
+
+
+def _wrap(angle: np.ndarray) -> np.ndarray:
+    return np.arctan2(np.sin(angle), np.cos(angle))
+
+
+def simulate(waypoints: List[Tuple[float, float]], configs: Sequence[pf.NavigationConfig], episodes: int = 100,
+             seed: Optional[int] = None, settings: Optional[SimulationSettings] = None,
+             tank: Optional[TankModel] = None) -> List[Dict]:
+    # 설정마다 episodes개 에피소드를 실행하고 설정별 요약 지표를 반환
+    settings = settings or SimulationSettings()
+    tank = tank or TankModel()
+    rng = np.random.default_rng(seed)
+    tracker = pf.PathTracker(waypoints)
+    if len(tracker.lengths) == 0:
+        raise ValueError("Route needs at least two waypoints")
+    points, segments, lengths, arc = tracker.points, tracker.segments, tracker.lengths, tracker.arc
+    length_sq = lengths ** 2
+    goal = points[-1]
+
+    p = _config_arrays(configs, episodes)
+    n = len(p["TOLERANCE"])
+
+    # 초기 상태: 경로 시작점 근처에서 첫 구간 방향을 향해 출발
+    pos = points[0] + rng.normal(0.0, settings.start_noise, size=(n, 2))
+    first = segments[0]
+    heading = math.atan2(first[0], first[1]) + rng.normal(0.0, settings.heading_noise, size=n)
+    estimated_heading = heading.copy()  # 제어기가 위치 변화로 추정하는 방향
+    velocity = np.zeros(n)
+    last_steering = np.zeros(n)
+    progress = np.zeros(n)
+    initial_distance = np.full(n, tracker.length)
+
+    active = np.ones(n, dtype=bool)
+    arrival_time = np.full(n, np.nan)
+    deviation_sum = np.zeros(n)
+    deviation_max = np.zeros(n)
+    ticks = np.zeros(n)
+    travelled = np.zeros(n)
+    counts = np.zeros((n, len(COMMANDS)), dtype=np.int64)
+    rows = np.arange(n)
+
+    started = time.perf_counter()
+    steps = int(settings.max_time / settings.dt)
+    for step in range(steps):
+        if not active.any():
+            break
+        idx = rows[active]
+
+        # 목적지 도착 판정
+        goal_distance = np.hypot(goal[0] - pos[idx, 0], goal[1] - pos[idx, 1])
+        arrived = goal_distance < p["TOLERANCE"][idx]
+        if arrived.any():
+            arrival_time[idx[arrived]] = step * settings.dt
+            active[idx[arrived]] = False
+            idx, goal_distance = idx[~arrived], goal_distance[~arrived]
+            if len(idx) == 0:
+                break
+
+        # 경로 투영 (PathTracker.project와 같은 규칙: 진행 위치 앞 window 구간에서 찾고, 벗어났으면 전체에서)
+        rel = pos[idx, None, :] - points[None, :-1, :]
+        t = np.divide((rel * segments).sum(axis=2), length_sq, out=np.zeros(rel.shape[:2]), where=length_sq > 0)
+        t = np.clip(t, 0.0, 1.0)
+        dist_sq = ((rel - segments * t[:, :, None]) ** 2).sum(axis=2)
+        s_all = arc[:-1] + t * lengths
+        prog, window = progress[idx], p["TRACKING_WINDOW"][idx]
+        in_window = (arc[None, 1:] >= prog[:, None]) & (arc[None, :-1] <= (prog + window)[:, None])
+        in_window[np.arange(len(idx)), np.minimum(np.searchsorted(arc, prog, side="right") - 1, len(lengths) - 1)] = True
+        windowed = np.where(in_window, dist_sq, np.inf)
+        k = np.argmin(windowed, axis=1)
+        nearest = np.sqrt(windowed[np.arange(len(idx)), k])
+        outside = nearest > window
+        if outside.any():
+            k[outside] = np.argmin(dist_sq[outside], axis=1)
+        nearest = np.sqrt(dist_sq[np.arange(len(idx)), k])
+        s = np.maximum(prog, s_all[np.arange(len(idx)), k])
+        progress[idx] = s
+
+        deviation_sum[idx] += nearest
+        deviation_max[idx] = np.maximum(deviation_max[idx], nearest)
+        ticks[idx] += 1
+
+        # lookahead 지점 (호장 이진 탐색)
+        distance = np.maximum(tracker.length - s, goal_distance)
+        lookahead = np.minimum(p["LOOKAHEAD_MAX"][idx], np.maximum(p["LOOKAHEAD_MIN"][idx], distance * 0.5 + 5.0))
+        target_s = np.clip(s + lookahead, 0.0, tracker.length)
+        seg = np.clip(np.searchsorted(arc, target_s, side="right") - 1, 0, len(lengths) - 1)
+        frac = np.divide(target_s - arc[seg], lengths[seg], out=np.zeros(len(idx)), where=lengths[seg] > 0)
+        target = points[seg] + segments[seg] * np.clip(frac, 0.0, 1.0)[:, None]
+
+        # 조향 (_calculate_steering)
+        target_heading = np.arctan2(target[:, 0] - pos[idx, 0], target[:, 1] - pos[idx, 1])
+        heading_error = _wrap(target_heading - estimated_heading[idx])
+        curvature = 2.0 * np.sin(heading_error) / np.maximum(lookahead, 0.01)
+        smoothing = p["STEERING_SMOOTHING"][idx]
+        steering = smoothing * last_steering[idx] + (1 - smoothing) * curvature
+        last_steering[idx] = steering
+
+        # 속도 (_calculate_speed)
+        max_speed, slow = p["MAX_SPEED"][idx], p["SLOW_RADIUS"][idx] * 0.5
+        speed = np.where(distance < slow, max_speed * distance / np.maximum(slow, 1e-9),
+                         max_speed - np.abs(steering) * p["SPEED_FACTOR"][idx])
+        speed = np.clip(speed, p["MIN_SPEED"][idx], max_speed)
+
+        # 명령 가중치 (_calculate_weights), 열 순서는 COMMANDS
+        abs_steering = np.abs(steering)
+        weights = np.stack([
+            np.where(steering > 0, p["WEIGHT_D"][idx] * (1 + abs_steering * 2), 0.0),
+            np.where(steering < 0, p["WEIGHT_A"][idx] * (1 + abs_steering * 2), 0.0),
+            p["WEIGHT_W"][idx] * speed,
+            np.where(heading_error > math.pi * 0.6, p["WEIGHT_S"][idx], 0.0),
+        ], axis=1)
+        weights = np.maximum(weights, 0.0)
+        path_progress = np.where(initial_distance[idx] > 0,
+                                 np.maximum(0.0, 1 - distance / initial_distance[idx]), 0.0)
+        weights *= (1 + path_progress * 0.5)[:, None]
+
+        # 가중치 비례 무작위 선택 (random.choices와 같은 분포)
+        cumulative = np.cumsum(weights, axis=1)
+        total = cumulative[:, -1]
+        draw = rng.random(len(idx)) * total
+        choice = np.minimum((cumulative <= draw[:, None]).sum(axis=1), len(COMMANDS) - 1)
+        has_command = total > 0
+        counts[idx[has_command], choice[has_command]] += 1
+        throttle = np.where(has_command, np.clip(weights[np.arange(len(idx)), choice], 0.0, 1.0), 0.0)
+
+        # 전차 운동 모델
+        target_velocity = np.where(choice == 2, throttle * tank.max_forward_speed,
+                                   np.where(choice == 3, -throttle * tank.max_reverse_speed, 0.0))
+        target_velocity = np.where(has_command, target_velocity, 0.0)
+        turning = has_command & (choice <= 1)
+        # 선회 중에는 속도 명령이 없으므로 현재 속도를 그대로 감쇠시킴
+        alpha = min(1.0, settings.dt / tank.time_constant) if tank.time_constant > 0 else 1.0
+        v = velocity[idx]
+        v = v + (target_velocity - v) * alpha
+        velocity[idx] = v
+        yaw = np.where(turning, np.where(choice == 0, 1.0, -1.0) * throttle * tank.turn_rate * settings.dt, 0.0)
+        heading[idx] = _wrap(heading[idx] + yaw)
+        step_x = v * settings.dt * np.sin(heading[idx])
+        step_z = v * settings.dt * np.cos(heading[idx])
+        pos[idx, 0] += step_x
+        pos[idx, 1] += step_z
+        moved = np.hypot(step_x, step_z)
+        travelled[idx] += moved
+
+        # 제어기의 방향 추정 (update_position과 같은 지수 평활)
+        h_smooth = p["HEADING_SMOOTHING"][idx]
+        observed = np.arctan2(step_x, step_z)
+        estimated = np.where(moved > 0.01,
+                             _wrap(h_smooth * estimated_heading[idx] + (1 - h_smooth) * observed),
+                             estimated_heading[idx])
+        estimated_heading[idx] = estimated
+    elapsed = time.perf_counter() - started
+
+    # 설정별 요약
+    results = []
+    penalty_time = settings.max_time * settings.failure_penalty
+    for i, config in enumerate(configs):
+        sl = slice(i * episodes, (i + 1) * episodes)
+        reached = ~np.isnan(arrival_time[sl])
+        times = np.where(reached, arrival_time[sl], penalty_time)
+        mean_deviation = float((deviation_sum[sl] / np.maximum(ticks[sl], 1)).mean())
+        command_counts = counts[sl].sum(axis=0)
+        results.append({
+            "config": config,
+            "episodes": episodes,
+            "success_rate": float(reached.mean()),
+            "mean_time_to_goal": float(arrival_time[sl][reached].mean()) if reached.any() else None,
+            "median_time_to_goal": float(np.median(arrival_time[sl][reached])) if reached.any() else None,
+            "mean_deviation": mean_deviation,
+            "max_deviation": float(deviation_max[sl].max()),
+            "mean_travelled": float(travelled[sl].mean()),
+            "command_counts": {cmd: int(c) for cmd, c in zip(COMMANDS, command_counts)},
+            "score": float(times.mean()) + settings.deviation_weight * mean_deviation,
+        })
+    for result in results:
+        result["batch_seconds"] = elapsed
+    return results
+
+
+def apply_params(base: pf.NavigationConfig, params: Dict[str, float]) -> pf.NavigationConfig:
+    # {"LOOKAHEAD_MAX": 12, "WEIGHT_FACTORS.W": 0.7} 형태의 값을 적용한 새 설정
+    weights = dict(base.WEIGHT_FACTORS)
+    fields = {}
+    for name, value in params.items():
+        if name.startswith("WEIGHT_FACTORS."):
+            weights[name.split(".", 1)[1]] = value
+        elif name in TUNABLE_FIELDS:
+            fields[name] = value
+        else:
+            raise ValueError(f"Unknown config parameter: {name}")
+    return dataclasses.replace(base, WEIGHT_FACTORS=weights, **fields)
+
+
+def grid_search(waypoints: List[Tuple[float, float]], space: Dict[str, Sequence[float]],
+                base: Optional[pf.NavigationConfig] = None, episodes: int = 100, seed: Optional[int] = None,
+                settings: Optional[SimulationSettings] = None, tank: Optional[TankModel] = None) -> List[Dict]:
+    # 모든 값 조합을 한 배치로 실행, 점수가 낮은 순으로 정렬
+    base = base or pf.NavigationConfig()
+    names = list(space)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    return _search(waypoints, base, combos, episodes, seed, settings, tank)
+
+
+def random_search(waypoints: List[Tuple[float, float]], space: Dict[str, Tuple[float, float]], trials: int = 50,
+                  base: Optional[pf.NavigationConfig] = None, episodes: int = 100, seed: Optional[int] = None,
+                  settings: Optional[SimulationSettings] = None, tank: Optional[TankModel] = None) -> List[Dict]:
+    # 각 파라미터를 (최소, 최대) 범위에서 균등 추출
+    base = base or pf.NavigationConfig()
+    rng = np.random.default_rng(seed)
+    combos = [{name: float(rng.uniform(lo, hi)) for name, (lo, hi) in space.items()} for _ in range(trials)]
+    return _search(waypoints, base, combos, episodes, seed, settings, tank)
+
+
+def _search(waypoints, base, combos, episodes, seed, settings, tank) -> List[Dict]:
+    configs = [apply_params(base, params) for params in combos]
+    results = simulate(waypoints, configs, episodes, seed, settings, tank)
+    for params, result in zip(combos, results):
+        result["params"] = params
+    return sorted(results, key=lambda r: r["score"])
+
+
+if __name__ == "__main__":
+    # 예시: 장애물을 돌아가는 경로에서 lookahead/조향 평활 무작위 탐색
+    grid = pf.Grid(pf.WORLD_SIZE, pf.WORLD_SIZE)
+    grid.set_obstacle(100, 140, 0, 180)
+    route = pf.Pathfinding().find_path((30, 30), (250, 60), grid)
+    route = pf.PathSmoother(grid).smooth(route)
+    print(f"Route: {len(route)} waypoints")
+    ranked = random_search(route, {
+        "LOOKAHEAD_MAX": (5.0, 20.0),
+        "STEERING_SMOOTHING": (0.0, 0.9),
+        "HEADING_SMOOTHING": (0.0, 0.9),
+        "WEIGHT_FACTORS.W": (0.3, 1.0),
+    }, trials=20, episodes=50, seed=0)
+    for result in ranked[:5]:
+        print(f"score={result['score']:.1f} success={result['success_rate']:.2f} "
+              f"time={result['mean_time_to_goal']} deviation={result['mean_deviation']:.2f} "
+              f"commands={result['command_counts']} params={result['params']}")
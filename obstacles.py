@@ -0,0 +1,104 @@
+import math
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# 장애물 사각형 저장소
+# - 같은 장애물이 매 틱마다 다시 들어와도 한 번만 저장 (ID 또는 양자화된 좌표 기준 중복 제거)
+#   ID가 같아도 범위가 바뀌면 (이동한 장애물) 이전 사각형을 지우고 새로 추가
+# - 균일 버킷 공간 인덱스로 영역 질의
+# - 전체 목록을 받아 추가/삭제된 사각형만 계산하는 diff 갱신
+
+BOUNDS = ("x_min", "x_max", "z_min", "z_max")
+
+
+class ObstacleStore:
+    def __init__(self, quantum: float = 0.5, bucket_size: float = 25.0):
+        self.quantum = quantum          # 중복 판정용 좌표 양자화 단위 (미터)
+        self.bucket_size = bucket_size  # 공간 인덱스 버킷 한 변 (미터)
+        self.rects: Dict[Hashable, Dict] = {}
+        self.buckets: Dict[Tuple[int, int], Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.rects
+
+    def values(self) -> List[Dict]:
+        return list(self.rects.values())
+
+    def items(self) -> List[Tuple[Hashable, Dict]]:
+        return list(self.rects.items())
+
+    def key_for(self, rect: Dict) -> Hashable:
+        if rect.get("id") is not None:
+            return ("id", rect["id"])
+        return tuple(int(round(float(rect[name]) / self.quantum)) for name in BOUNDS)
+
+    def same_bounds(self, a: Dict, b: Dict) -> bool:
+        return all(int(round(a[name] / self.quantum)) == int(round(b[name] / self.quantum)) for name in BOUNDS)
+
+    @staticmethod
+    def normalize(rect: Dict) -> Dict:
+        normalized = {name: float(rect[name]) for name in BOUNDS}
+        if rect.get("id") is not None:
+            normalized["id"] = rect["id"]
+        return normalized
+
+    def _bucket_range(self, x_min, x_max, z_min, z_max):
+        bx0, bx1 = int(math.floor(x_min / self.bucket_size)), int(math.floor(x_max / self.bucket_size))
+        bz0, bz1 = int(math.floor(z_min / self.bucket_size)), int(math.floor(z_max / self.bucket_size))
+        for bx in range(bx0, bx1 + 1):
+            for bz in range(bz0, bz1 + 1):
+                yield bx, bz
+
+    def add(self, rect: Dict) -> Optional[Hashable]:
+        # 새로 추가(또는 같은 ID의 범위가 바뀌어 교체)된 경우 키를, 이미 있는 같은 장애물이면 None 반환
+        rect = self.normalize(rect)
+        key = self.key_for(rect)
+        previous = self.rects.get(key)
+        if previous is not None:
+            if self.same_bounds(previous, rect):
+                return None
+            self.remove(key)
+        self.rects[key] = rect
+        for bucket in self._bucket_range(rect["x_min"], rect["x_max"], rect["z_min"], rect["z_max"]):
+            self.buckets.setdefault(bucket, set()).add(key)
+        return key
+
+    def remove(self, key: Hashable) -> Optional[Dict]:
+        rect = self.rects.pop(key, None)
+        if rect is None:
+            return None
+        for bucket in self._bucket_range(rect["x_min"], rect["x_max"], rect["z_min"], rect["z_max"]):
+            keys = self.buckets.get(bucket)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.buckets[bucket]
+        return rect
+
+    def query(self, x_min: float, x_max: float, z_min: float, z_max: float) -> List[Tuple[Hashable, Dict]]:
+        # 주어진 영역과 겹치는 장애물 목록
+        found = {}
+        for bucket in self._bucket_range(x_min, x_max, z_min, z_max):
+            for key in self.buckets.get(bucket, ()):
+                if key in found:
+                    continue
+                rect = self.rects[key]
+                if rect["x_min"] <= x_max and rect["x_max"] >= x_min and \
+                        rect["z_min"] <= z_max and rect["z_max"] >= z_min:
+                    found[key] = rect
+        return list(found.items())
+
+    def diff(self, rects: Iterable[Dict]) -> Tuple[List[Dict], List[Hashable]]:
+        # 전체 장애물 목록과 비교하여 (새로 추가할 사각형, 삭제할 키) 반환
+        # 같은 ID의 범위가 바뀐 장애물은 삭제 하나 + 추가 하나
+        incoming = {}
+        for rect in rects:
+            rect = self.normalize(rect)
+            incoming.setdefault(self.key_for(rect), rect)
+        changed = {key for key, rect in incoming.items()
+                   if key in self.rects and not self.same_bounds(self.rects[key], rect)}
+        added = [rect for key, rect in incoming.items() if key not in self.rects or key in changed]
+        removed = [key for key in self.rects if key not in incoming or key in changed]
+        return added, removed
@@ -1,11 +1,16 @@
 from dataclasses import dataclass
-from typing import Optional, Tuple, Dict, List
+from typing import Callable, Optional, Tuple, Dict, List
 import time
 import math
+import copy
 import heapq
 import random
+import threading
 import numpy as np
-import plotly.graph_objects as go
+import metrics
+from obstacles import ObstacleStore
+from visualization import PathVisualizer, LiveStream, VISUALIZATION_FILE
+from trajectory import TrajectoryBuffer
 
 # 전차 크기 정의 (x: 5미터, z: 11미터)
 VEHICLE_WIDTH = int(5.0)
@@ -14,125 +19,717 @@ VEHICLE_LENGTH = int(11.0)
 # 월드 크기 정의
 WORLD_SIZE = 300  # 300x300 미터
 
-class Node:
-    def __init__(self, grid_x, grid_z):
-        self.grid_x = grid_x
-        self.grid_z = grid_z
-        self.g_cost = 0
-        self.h_cost = 0
-        self.parent = None
-        self.is_obstacle = False
+# 장애물 확장 거리 (미터)
+OBSTACLE_EXTENSION = 10.0
 
-    @property
-    def f_cost(self):
-        return self.g_cost + self.h_cost
+# 근접 비용 지도 기본값: 장애물에서 COSTMAP_RADIUS 이내의 셀에 weight * exp(-decay * 거리) 비용 추가
+COSTMAP_RADIUS = 15.0
+COSTMAP_WEIGHT = 20.0
+COSTMAP_DECAY = 0.2
 
-    def __lt__(self, other):
-        return self.f_cost < other.f_cost
+# 8방향 이동 (상하좌우 + 대각선), 대각선 이동 비용은 √2로 증가
+NEIGHBOR_STEPS = [(0, 1, 10), (1, 0, 10), (0, -1, 10), (-1, 0, 10),
+                  (1, 1, 14), (1, -1, 14), (-1, 1, 14), (-1, -1, 14)]
 
 class Grid:
-    def __init__(self, width=WORLD_SIZE, height=WORLD_SIZE):
-        self.width = width
-        self.height = height
-        self.grid = [[Node(x, z) for z in range(height)] for x in range(width)]
-        self.original_obstacles = []  # 원래 좌표 저장용 리스트
-
-    def node_from_world_point(self, world_x, world_z):
-        grid_x = max(0, min(int(world_x), self.width - 1))
-        grid_z = max(0, min(int(world_z), self.height - 1))
-        return self.grid[grid_x][grid_z]
-
-    def set_obstacle(self, x_min, x_max, z_min, z_max):
-        # 원래 좌표 저장
-        self.original_obstacles.append({
-            "x_min": x_min,
-            "x_max": x_max,
-            "z_min": z_min,
-            "z_max": z_max
-        })
+    def __init__(self, width=WORLD_SIZE, height=WORLD_SIZE, cell_size=1.0, origin=(0.0, 0.0),
+                 inflation=OBSTACLE_EXTENSION, costmap_radius=COSTMAP_RADIUS,
+                 costmap_weight=COSTMAP_WEIGHT, costmap_decay=COSTMAP_DECAY):
+        # width, height는 월드 크기(미터), 셀 개수는 cell_size로 결정
+        self.cell_size = float(cell_size)
+        self.inflation = float(inflation)
+        self.costmap_radius = float(costmap_radius)
+        self.costmap_weight = float(costmap_weight)
+        self.costmap_decay = float(costmap_decay)
+        self.origin_x, self.origin_z = float(origin[0]), float(origin[1])
+        self.world_width = float(width)
+        self.world_height = float(height)
+        self.width = max(1, int(math.ceil(self.world_width / self.cell_size)))
+        self.height = max(1, int(math.ceil(self.world_height / self.cell_size)))
+        self.obstacle = np.zeros((self.width, self.height), dtype=bool)
+        # 셀마다 겹친 (확장된) 장애물 개수, 장애물 삭제 시 다른 장애물 영역을 보존하기 위해 사용
+        self.coverage = np.zeros((self.width, self.height), dtype=np.int32)
+        # 원래 장애물까지의 거리(미터, costmap_radius에서 포화)와 이를 변환한 이동 비용
+        self.distance = np.full((self.width, self.height), self.costmap_radius, dtype=np.float32)
+        self.cost = np.zeros((self.width, self.height), dtype=np.float32)
+        self.obstacles = ObstacleStore()  # 원래 좌표 저장 (중복 제거 + 공간 인덱스)
+        self.version = 0  # 장애물이 바뀔 때마다 증가
+        self.listeners: List[Callable[[str, Dict], None]] = []  # 장애물 추가/삭제 알림 ("added"/"removed", 사각형)
+        self._snapshot: Optional["Grid"] = None
+        self._search_layers: Optional[Tuple[int, List[bool], List[float]]] = None  # (version, 통과 불가, 근접 비용)
+        # 장애물 저장소 변경, 격자/비용 지도 갱신, version 증가와 스냅샷 복사를 묶는 잠금
+        # (여러 전차가 /update_obstacle로 같은 지도를 동시에 갱신)
+        self.write_lock = threading.RLock()
+
+    @property
+    def original_obstacles(self) -> List[Dict]:
+        return self.obstacles.values()
+
+    def snapshot(self) -> "Grid":
+        # 백그라운드 탐색용 복사본 (장애물 배열만 깊은 복사)
+        # 같은 버전의 복사본은 여러 전차의 경로 탐색 스레드가 공유 (읽기 전용)
+        cached = self._snapshot
+        if cached is not None and cached.version == self.version:
+            return cached
+        with self.write_lock:
+            cached = self._snapshot
+            if cached is not None and cached.version == self.version:
+                return cached
+            snap = copy.copy(self)
+            snap._snapshot = None
+            snap.obstacle = self.obstacle.copy()
+            snap.cost = self.cost.copy()
+            self._snapshot = snap
+            return snap
+
+    def search_layers(self) -> Tuple[List[bool], List[float]]:
+        # 탐색 루프용 평탄화된 파이썬 리스트 (x * height + z), 지도 버전마다 한 번만 생성
+        cached = self._search_layers
+        if cached is None or cached[0] != self.version:
+            with self.write_lock:
+                cached = (self.version, self.obstacle.ravel().tolist(), self.cost.ravel().tolist())
+            self._search_layers = cached
+        return cached[1], cached[2]
+
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        return (self.origin_x, self.origin_x + self.world_width,
+                self.origin_z, self.origin_z + self.world_height)
+
+    def cells(self, meters: float) -> int:
+        # 미터 단위 거리를 셀 개수로 변환 (올림)
+        return int(math.ceil(meters / self.cell_size))
+
+    def world_to_cell(self, world_x, world_z) -> Tuple[int, int]:
+        grid_x = int(math.floor((world_x - self.origin_x) / self.cell_size))
+        grid_z = int(math.floor((world_z - self.origin_z) / self.cell_size))
+        return (max(0, min(grid_x, self.width - 1)),
+                max(0, min(grid_z, self.height - 1)))
+
+    def cell_to_world(self, grid_x, grid_z) -> Tuple[float, float]:
+        # 셀 중심의 월드 좌표
+        return (self.origin_x + (grid_x + 0.5) * self.cell_size,
+                self.origin_z + (grid_z + 0.5) * self.cell_size)
+
+    def clamp_world(self, world_x, world_z) -> Tuple[float, float]:
+        x_min, x_max, z_min, z_max = self.bounds
+        return max(x_min, min(world_x, x_max)), max(z_min, min(world_z, z_max))
+
+    def set_obstacle(self, x_min, x_max, z_min, z_max, obstacle_id=None) -> bool:
+        # 원래 좌표 저장, 이미 등록된 장애물이면 격자를 다시 칠하지 않음
+        # 같은 ID의 범위가 바뀌었으면 이전 사각형을 격자에서 지운 뒤 새 범위로 칠함
+        rect = self.obstacles.normalize({"x_min": x_min, "x_max": x_max, "z_min": z_min, "z_max": z_max,
+                                         "id": obstacle_id})
+        with self.write_lock:
+            key = self.obstacles.key_for(rect)
+            previous = self.obstacles.rects.get(key)
+            if previous is not None and not self.obstacles.same_bounds(previous, rect):
+                self.remove_obstacle(key)
+            key = self.obstacles.add(rect)
+            if key is None:
+                return False
+            rect = self.obstacles.rects[key]
+            self._rasterize(rect, 1)
+        self._notify("added", rect)
+        return True
+
+    def remove_obstacle(self, key) -> bool:
+        with self.write_lock:
+            rect = self.obstacles.remove(key)
+            if rect is None:
+                return False
+            self._rasterize(rect, -1)
+        self._notify("removed", rect)
+        return True
+
+    def _notify(self, change: str, rect: Dict) -> None:
+        for listener in list(self.listeners):
+            listener(change, rect)
+
+    def sync_obstacles(self, rects) -> Tuple[int, int]:
+        # 전체 장애물 목록으로 교체, 새로 생기거나 사라진 사각형만 격자에 반영
+        with self.write_lock:
+            added, removed = self.obstacles.diff(rects)
+            for key in removed:
+                self.remove_obstacle(key)
+            for rect in added:
+                self.set_obstacle(rect["x_min"], rect["x_max"], rect["z_min"], rect["z_max"], rect.get("id"))
+        return len(added), len(removed)
 
+    def _window(self, rect, margin):
+        cx_min, cz_min = self.world_to_cell(rect["x_min"] - margin, rect["z_min"] - margin)
+        cx_max, cz_max = self.world_to_cell(rect["x_max"] + margin, rect["z_max"] + margin)
+        return slice(cx_min, cx_max + 1), slice(cz_min, cz_max + 1)
+
+    def _rasterize(self, rect, delta):
         # A* 경로 탐색을 위한 확장 적용
-        EXTENSION = 10
-        x_min_ext = max(0, min(int(x_min) - EXTENSION, self.width - 1))
-        x_max_ext = max(0, min(int(x_max) + EXTENSION, self.width - 1))
-        z_min_ext = max(0, min(int(z_min) - EXTENSION, self.height - 1))
-        z_max_ext = max(0, min(int(z_max) + EXTENSION, self.height - 1))
-        for x in range(x_min_ext, x_max_ext + 1):
-            for z in range(z_min_ext, z_max_ext + 1):
-                self.grid[x][z].is_obstacle = True
-
-    def get_neighbors(self, node):
-        neighbors = []
-        # 8방향 탐색 (상하좌우 + 대각선)
-        for dx, dz in [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)]:
-            new_x, new_z = node.grid_x + dx, node.grid_z + dz
-            if 0 <= new_x < self.width and 0 <= new_z < self.height:
-                neighbor = self.grid[new_x][new_z]
-                if not neighbor.is_obstacle:
-                    # 대각선 이동 비용은 √2로 증가
-                    move_cost = 10 if dx == 0 or dz == 0 else 14
-                    neighbors.append((neighbor, move_cost))
-        return neighbors
+        window = self._window(rect, self.inflation)
+        self.coverage[window] += delta
+        self.obstacle[window] = self.coverage[window] > 0
+        self._update_costmap(rect, added=delta > 0)
+        self.version += 1
+
+    def _rect_distance(self, rect, window):
+        # 창 안의 셀 중심에서 사각형까지의 유클리드 거리
+        xs = self.origin_x + (np.arange(window[0].start, window[0].stop) + 0.5) * self.cell_size
+        zs = self.origin_z + (np.arange(window[1].start, window[1].stop) + 0.5) * self.cell_size
+        dx = np.maximum(np.maximum(rect["x_min"] - xs, xs - rect["x_max"]), 0.0)
+        dz = np.maximum(np.maximum(rect["z_min"] - zs, zs - rect["z_max"]), 0.0)
+        return np.hypot(dx[:, None], dz[None, :]).astype(np.float32)
+
+    def _update_costmap(self, rect, added):
+        # 변경된 사각형 주변(costmap_radius)만 거리장을 갱신
+        window = self._window(rect, self.costmap_radius)
+        if added:
+            np.minimum(self.distance[window], self._rect_distance(rect, window), out=self.distance[window])
+        else:
+            # 삭제 시에는 창과 겹치는 남은 장애물로 거리를 다시 계산
+            distance = np.full_like(self.distance[window], self.costmap_radius)
+            reach = 2 * self.costmap_radius
+            for _, other in self.obstacles.query(rect["x_min"] - reach, rect["x_max"] + reach,
+                                                 rect["z_min"] - reach, rect["z_max"] + reach):
+                np.minimum(distance, self._rect_distance(other, window), out=distance)
+            self.distance[window] = distance
+        distance = self.distance[window]
+        self.cost[window] = np.where(distance < self.costmap_radius,
+                                     self.costmap_weight * np.exp(-self.costmap_decay * distance), 0.0)
+
+    def is_walkable(self, grid_x, grid_z, max_cost=None):
+        # max_cost가 주어지면 근접 비용이 그보다 큰 셀도 통과 불가로 취급
+        if not (0 <= grid_x < self.width and 0 <= grid_z < self.height):
+            return False
+        if self.obstacle[grid_x, grid_z]:
+            return False
+        return max_cost is None or self.cost[grid_x, grid_z] <= max_cost
+
+    def footprint_blocked(self, grid_x, grid_z) -> bool:
+        # 전차 크기(5m x 11m)를 셀 단위로 환산하여 주변 장애물 확인 (내림: 1m 셀에서 5 x 11셀)
+        half_width = int(VEHICLE_WIDTH / 2 / self.cell_size)
+        half_length = int(VEHICLE_LENGTH / 2 / self.cell_size)
+        x0, x1 = max(0, grid_x - half_width), min(self.width, grid_x + half_width + 1)
+        z0, z1 = max(0, grid_z - half_length), min(self.height, grid_z + half_length + 1)
+        return bool(self.obstacle[x0:x1, z0:z1].any())
+
+    def line_of_sight(self, start, end, max_cost=None):
+        # 두 셀 중심을 잇는 선분이 지나는 모든 셀을 검사 (확장된 장애물 기준)
+        x0, z0 = start
+        x1, z1 = end
+        if not self.is_walkable(x0, z0) or not self.is_walkable(x1, z1):
+            return False
+        dx, dz = abs(x1 - x0), abs(z1 - z0)
+        step_x = 1 if x1 > x0 else -1
+        step_z = 1 if z1 > z0 else -1
+        x, z = x0, z0
+        # 오차 항은 2배 스케일로 유지하여 정수 연산만 사용
+        error = dx - dz
+        dx2, dz2 = dx * 2, dz * 2
+        while x != x1 or z != z1:
+            if error > 0:
+                x += step_x
+                error -= dz2
+            elif error < 0:
+                z += step_z
+                error += dx2
+            else:
+                # 선분이 격자 꼭짓점을 정확히 지나는 경우 인접한 두 셀 모두 검사
+                if not self.is_walkable(x + step_x, z, max_cost) or not self.is_walkable(x, z + step_z, max_cost):
+                    return False
+                x += step_x
+                z += step_z
+                error += dx2 - dz2
+            if not self.is_walkable(x, z, max_cost):
+                return False
+        return True
+
+@dataclass
+class PlanResult:
+    path: List[Tuple[float, float]]
+    epsilon: float
+    reached: bool      # False면 목표 대신 도달 가능한 가장 가까운 셀까지의 경로
+    exhausted: bool    # 열린 목록을 모두 소진함 (목표 도달 불가가 확정됨)
+    timed_out: bool
+    expanded: int
+
+    @property
+    def final(self) -> bool:
+        # 더 이상 개선할 여지가 없는 결과인지
+        return not self.timed_out and self.epsilon <= 1.0
 
 class Pathfinding:
+    # 가중 A* 휴리스틱 가중치, 큰 값부터 순서대로 탐색하며 경로를 개선 (anytime)
+    EPSILONS = (3.0, 2.0, 1.5, 1.0)
+    # 마감 시간 확인 주기 (확장 노드 수)
+    DEADLINE_CHECK_INTERVAL = 256
+
     def find_path(self, start_pos, target_pos, grid):
-        start_node = grid.node_from_world_point(start_pos[0], start_pos[1])
-        target_node = grid.node_from_world_point(target_pos[0], target_pos[1])
-        
-        if start_node.is_obstacle or target_node.is_obstacle:
-            print("Warning: Start or target position is on an obstacle.")
+        cells = self._prepare(start_pos, target_pos, grid)
+        if cells is None:
             return []
+        result = self._search(grid, cells[0], cells[1], 1.0)
+        return result.path if result.reached else []
+
+    def plan(self, start_pos, target_pos, grid, time_budget: Optional[float] = None,
+             cancel: Optional[Callable[[], bool]] = None) -> Optional[PlanResult]:
+        # 마감 시간 안에서 가장 좋은 경로를 반환, 시간 초과 시 지금까지의 최선 경로
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        best = None
+        for result in self.refine(start_pos, target_pos, grid, deadline=deadline, cancel=cancel):
+            if result.timed_out and best is not None and not best.timed_out:
+                # 중단된 탐색보다 이전에 완료된 경로가 더 낫다
+                break
+            best = result
+            if result.timed_out:
+                break
+        return best
+
+    def refine(self, start_pos, target_pos, grid, after: Optional[PlanResult] = None,
+               deadline: Optional[float] = None, cancel: Optional[Callable[[], bool]] = None):
+        # epsilon을 줄여가며 개선된 PlanResult를 순서대로 생성, after가 있으면 그 다음 단계부터 재개
+        cells = self._prepare(start_pos, target_pos, grid, allow_blocked_target=True)
+        if cells is None:
+            return
+        start_cell, target_cell = cells
+        if after is not None and after.exhausted:
+            # 도달 불가가 이미 확정됨: 가장 가까운 셀까지의 최적 경로만 남음
+            if not after.final and after.path:
+                yield self._fallback(grid, start_cell, after, deadline, cancel)
+            return
+        if after is None:
+            # 마감 시간이 없으면 중간 단계 없이 바로 최적 탐색
+            epsilons = list(self.EPSILONS) if deadline is not None else [self.EPSILONS[-1]]
+        elif after.timed_out:
+            epsilons = [e for e in self.EPSILONS if e <= after.epsilon]
+        else:
+            epsilons = [e for e in self.EPSILONS if e < after.epsilon]
+        for epsilon in epsilons:
+            result = self._search(grid, start_cell, target_cell, epsilon, deadline, cancel)
+            yield result
+            if result.timed_out:
+                return
+            if result.exhausted:
+                if not result.final and result.path:
+                    yield self._fallback(grid, start_cell, result, deadline, cancel)
+                return
+
+    def _fallback(self, grid, start_cell, exhausted: PlanResult, deadline: Optional[float],
+                  cancel: Optional[Callable[[], bool]] = None) -> PlanResult:
+        # 목표 도달 불가: 가장 가까운 셀을 새 목표로 최적 경로 탐색
+        target_cell = grid.world_to_cell(*exhausted.path[-1])
+        result = self._search(grid, start_cell, target_cell, 1.0, deadline, cancel)
+        result.reached = False
+        result.exhausted = True
+        if result.timed_out:
+            # 시간 초과 시 이전 결과로 대체되도록 epsilon 유지
+            result.epsilon = exhausted.epsilon
+        return result
+
+    def _prepare(self, start_pos, target_pos, grid, allow_blocked_target=False):
+        start_x, start_z = grid.world_to_cell(start_pos[0], start_pos[1])
+        target_x, target_z = grid.world_to_cell(target_pos[0], target_pos[1])
+
+        if grid.obstacle[start_x, start_z] or (grid.obstacle[target_x, target_z] and not allow_blocked_target):
+            print("Warning: Start or target position is on an obstacle.")
+            return None
 
         # 전차 크기(5m x 11m) 고려
-        half_width = VEHICLE_WIDTH // 2
-        half_length = VEHICLE_LENGTH // 2
-        for dx in range(-half_width, half_width + 1):
-            for dz in range(-half_length, half_length + 1):
-                check_x = start_node.grid_x + dx
-                check_z = start_node.grid_z + dz
-                if (0 <= check_x < grid.width and 0 <= check_z < grid.height and
-                    grid.grid[check_x][check_z].is_obstacle):
-                    print("Warning: Start position is near an obstacle.")
-                    return []
-
-        open_set = []
-        heapq.heappush(open_set, (start_node.f_cost, id(start_node), start_node))
-        open_set_nodes = {start_node}
-        closed_set = set()
+        if grid.footprint_blocked(start_x, start_z):
+            print("Warning: Start position is near an obstacle.")
+            return None
+        return (start_x, start_z), (target_x, target_z)
+
+    def _search(self, grid, start_cell, target_cell, epsilon: float,
+                deadline: Optional[float] = None, cancel: Optional[Callable[[], bool]] = None) -> PlanResult:
+        # 셀 상태는 평탄화된 인덱스(x * height + z)로 관리
+        width, height = grid.width, grid.height
+        blocked, proximity = grid.search_layers()
+        start_x, start_z = start_cell
+        target_x, target_z = target_cell
+        start_idx = start_x * height + start_z
+        target_idx = target_x * height + target_z
+
+        def heuristic(x, z):
+            # 유클리드 거리 기반 휴리스틱
+            dx_h = x - target_x
+            dz_h = z - target_z
+            return math.sqrt(dx_h * dx_h + dz_h * dz_h) * 10
+
+        g_cost = {start_idx: 0}
+        parent = {start_idx: -1}
+        closed = bytearray(width * height)
+        open_set = [(0.0, 0, start_idx)]
+        # 목표에 도달하지 못할 경우를 대비해 목표와 가장 가까운 확장 노드 기록
+        closest, closest_h = start_idx, heuristic(start_x, start_z)
+        expanded = 0
 
         while open_set:
-            _, _, current_node = heapq.heappop(open_set)
-            open_set_nodes.remove(current_node)
-            closed_set.add(current_node)
+            _, current_g, current = heapq.heappop(open_set)
+            if closed[current]:
+                continue
+            closed[current] = 1
+            expanded += 1
+
+            if current == target_idx:
+                return PlanResult(self.retrace_path(parent, current, grid), epsilon, True, False, False, expanded)
+
+            x, z = divmod(current, height)
+            current_h = heuristic(x, z)
+            if current_h < closest_h:
+                closest, closest_h = current, current_h
 
-            if current_node.grid_x == target_node.grid_x and current_node.grid_z == target_node.grid_z:
-                return self.retrace_path(start_node, current_node)
+            # 마감 시간 초과 또는 취소 요청 시 중단 (timed_out으로 표시)
+            if expanded % self.DEADLINE_CHECK_INTERVAL == 0 and (
+                    (deadline is not None and time.perf_counter() > deadline) or (cancel is not None and cancel())):
+                return PlanResult(self.retrace_path(parent, closest, grid), epsilon, False, False, True, expanded)
 
-            for neighbor, move_cost in grid.get_neighbors(current_node):
-                if neighbor in closed_set:
+            for dx, dz, move_cost in NEIGHBOR_STEPS:
+                new_x, new_z = x + dx, z + dz
+                if not (0 <= new_x < width and 0 <= new_z < height):
                     continue
-                new_cost = current_node.g_cost + move_cost
-                if new_cost < neighbor.g_cost or neighbor not in open_set_nodes:
-                    neighbor.g_cost = new_cost
-                    # 유클리드 거리 기반 휴리스틱
-                    dx_h = neighbor.grid_x - target_node.grid_x
-                    dz_h = neighbor.grid_z - target_node.grid_z
-                    neighbor.h_cost = math.sqrt(dx_h * dx_h + dz_h * dz_h) * 10
-                    neighbor.parent = current_node
-                    if neighbor not in open_set_nodes:
-                        open_set_nodes.add(neighbor)
-                        heapq.heappush(open_set, (neighbor.f_cost, id(neighbor), neighbor))
-        return []
-
-    def retrace_path(self, start_node, end_node):
+                neighbor = new_x * height + new_z
+                if blocked[neighbor] or closed[neighbor]:
+                    continue
+                # 대각선 이동은 양옆 직교 이웃이 모두 비어 있을 때만 (line_of_sight와 같은 모서리 규칙)
+                if dx and dz and (blocked[new_x * height + z] or blocked[current + dz]):
+                    continue
+                # 장애물 근접 비용을 더해 여유 공간이 있는 경로를 선호
+                new_cost = current_g + move_cost + proximity[neighbor]
+                if new_cost < g_cost.get(neighbor, math.inf):
+                    g_cost[neighbor] = new_cost
+                    parent[neighbor] = current
+                    f_cost = new_cost + epsilon * heuristic(new_x, new_z)
+                    heapq.heappush(open_set, (f_cost, new_cost, neighbor))
+        return PlanResult(self.retrace_path(parent, closest, grid), epsilon, False, True, False, expanded)
+
+    def retrace_path(self, parent, end_idx, grid):
         path = []
-        current_node = end_node
-        while current_node != start_node:
-            path.append(current_node)
-            current_node = current_node.parent
-        path.append(start_node)
+        current = end_idx
+        while current != -1:
+            path.append(divmod(current, grid.height))
+            current = parent[current]
         path.reverse()
-        return [(node.grid_x, node.grid_z) for node in path]
+        return [grid.cell_to_world(x, z) for x, z in path]
+
+# 경로 후처리: 가시선 기반 경로 당기기 + 스플라인 재샘플링
+class PathSmoother:
+    def __init__(self, grid: Grid, cost_tolerance: float = 1.0):
+        self.grid = grid
+        # 당긴 선분은 양 끝점의 근접 비용 + cost_tolerance 이하의 셀만 지나도록 제한 (여유 공간 유지)
+        self.cost_tolerance = cost_tolerance
+
+    def smooth(self, path: List[Tuple[float, float]], spacing: float = 0.0) -> List[Tuple[float, float]]:
+        if len(path) < 3:
+            return list(path)
+        pulled = self.string_pull(path)
+        if spacing > 0:
+            return self.resample(pulled, spacing)
+        return pulled
+
+    def _visible(self, a: Tuple[float, float], b: Tuple[float, float]) -> bool:
+        cell_a, cell_b = self.grid.world_to_cell(*a), self.grid.world_to_cell(*b)
+        max_cost = max(self.grid.cost[cell_a], self.grid.cost[cell_b]) + self.cost_tolerance
+        return self.grid.line_of_sight(cell_a, cell_b, max_cost)
+
+    def string_pull(self, path: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+        # 현재 기준점에서 보이는 가장 먼 점까지 건너뛰어 중간 웨이포인트 제거
+        result = [path[0]]
+        anchor = path[0]
+        for i in range(2, len(path)):
+            if not self._visible(anchor, path[i]):
+                anchor = path[i - 1]
+                result.append(anchor)
+        result.append(path[-1])
+        return result
+
+    def resample(self, path: List[Tuple[float, float]], spacing: float) -> List[Tuple[float, float]]:
+        # Catmull-Rom 스플라인을 일정 간격으로 샘플링
+        points = np.asarray(path, dtype=float)
+        if len(points) < 2:
+            return [tuple(p) for p in points]
+        padded = np.vstack([points[0], points, points[-1]])
+        dense = []
+        for i in range(1, len(padded) - 2):
+            p0, p1, p2, p3 = padded[i - 1], padded[i], padded[i + 1], padded[i + 2]
+            segment_length = np.linalg.norm(p2 - p1)
+            steps = max(2, int(math.ceil(segment_length / (spacing * 0.25))))
+            t = np.linspace(0.0, 1.0, steps, endpoint=False)[:, None]
+            t2, t3 = t * t, t * t * t
+            dense.append(0.5 * ((2 * p1) + (-p0 + p2) * t +
+                                (2 * p0 - 5 * p1 + 4 * p2 - p3) * t2 +
+                                (-p0 + 3 * p1 - 3 * p2 + p3) * t3))
+        dense.append(points[-1:])
+        curve = np.vstack(dense)
+
+        # 스플라인이 장애물과 겹치면 당긴 경로를 직선 구간으로 재샘플링, 그것도 모서리를 가로지르면 당긴 경로 그대로
+        for polyline in (curve, points):
+            sampled = self._sample_by_arc_length(polyline, spacing)
+            if all(self._visible(a, b) for a, b in zip(sampled, sampled[1:])):
+                return [(float(x), float(z)) for x, z in sampled]
+        return [tuple(map(float, p)) for p in points]
+
+    @staticmethod
+    def _sample_by_arc_length(polyline: np.ndarray, spacing: float) -> np.ndarray:
+        seg = np.linalg.norm(np.diff(polyline, axis=0), axis=1)
+        arc = np.concatenate([[0.0], np.cumsum(seg)])
+        total = arc[-1]
+        if total <= 0:
+            return polyline[:1]
+        targets = np.arange(spacing, total, spacing)
+        targets = np.concatenate([targets, [total]])
+        x = np.interp(targets, arc, polyline[:, 0])
+        z = np.interp(targets, arc, polyline[:, 1])
+        return np.vstack([polyline[:1], np.column_stack([x, z])])
+
+# 목표 기준 흐름장: 목표에서 한 번의 Dijkstra로 모든 셀의 남은 비용과 최선 이동 방향을 계산
+class FlowField:
+    # 각 이동 방향의 반대 방향 인덱스 (이웃에서 현재 셀을 바라보는 방향)
+    OPPOSITE = [NEIGHBOR_STEPS.index(next(step for step in NEIGHBOR_STEPS if step[0] == -dx and step[1] == -dz))
+                for dx, dz, _ in NEIGHBOR_STEPS]
+
+    def __init__(self, grid: Grid, goal: Tuple[float, float], distance: np.ndarray, direction: np.ndarray):
+        self.grid = grid
+        self.goal = goal
+        self.version = grid.version
+        self.distance = distance    # 목표까지의 누적 이동 비용 (도달 불가 셀은 inf)
+        self.direction = direction  # NEIGHBOR_STEPS 인덱스 (-1: 목표 셀 또는 도달 불가)
+
+    @classmethod
+    def compute(cls, grid: Grid, goal: Tuple[float, float],
+                cancel: Optional[Callable[[], bool]] = None) -> Optional["FlowField"]:
+        width, height = grid.width, grid.height
+        blocked, proximity = grid.search_layers()
+        goal_x, goal_z = grid.world_to_cell(*goal)
+        goal_idx = goal_x * height + goal_z
+
+        distance = [math.inf] * (width * height)
+        direction = [-1] * (width * height)
+        distance[goal_idx] = 0.0
+        open_set = [(0.0, goal_idx)]
+        popped = 0
+        while open_set:
+            current_d, current = heapq.heappop(open_set)
+            if current_d > distance[current]:
+                continue
+            popped += 1
+            if cancel is not None and popped % Pathfinding.DEADLINE_CHECK_INTERVAL == 0 and cancel():
+                return None
+            x, z = divmod(current, height)
+            # 이웃에서 현재 셀로 들어오는 비용 = 이동 비용 + 현재 셀의 근접 비용
+            enter_cost = proximity[current]
+            for k, (dx, dz, move_cost) in enumerate(NEIGHBOR_STEPS):
+                new_x, new_z = x + dx, z + dz
+                if not (0 <= new_x < width and 0 <= new_z < height):
+                    continue
+                neighbor = new_x * height + new_z
+                if blocked[neighbor] or (dx and dz and (blocked[new_x * height + z] or blocked[current + dz])):
+                    continue
+                new_d = current_d + move_cost + enter_cost
+                if new_d < distance[neighbor]:
+                    distance[neighbor] = new_d
+                    direction[neighbor] = cls.OPPOSITE[k]
+                    heapq.heappush(open_set, (new_d, neighbor))
+
+        return cls(grid, goal,
+                   np.array(distance, dtype=np.float32).reshape(width, height),
+                   np.array(direction, dtype=np.int8).reshape(width, height))
+
+    def cost_to_go(self, world_x: float, world_z: float) -> float:
+        return float(self.distance[self.grid.world_to_cell(world_x, world_z)])
+
+    def direction_at(self, world_x: float, world_z: float) -> Optional[Tuple[float, float]]:
+        # 현재 위치에서의 조향 방향 (단위 벡터), 목표 셀이거나 도달 불가면 None
+        k = int(self.direction[self.grid.world_to_cell(world_x, world_z)])
+        if k < 0:
+            return None
+        dx, dz, _ = NEIGHBOR_STEPS[k]
+        norm = math.sqrt(dx * dx + dz * dz)
+        return dx / norm, dz / norm
+
+    def lookahead_point(self, world_x: float, world_z: float, distance: float) -> Optional[Tuple[float, float]]:
+        # 흐름장을 따라 distance(미터)만큼 전진한 지점
+        grid_x, grid_z = self.grid.world_to_cell(world_x, world_z)
+        if not math.isfinite(self.distance[grid_x, grid_z]):
+            return None
+        for _ in range(max(1, self.grid.cells(distance))):
+            k = int(self.direction[grid_x, grid_z])
+            if k < 0:
+                break
+            grid_x += NEIGHBOR_STEPS[k][0]
+            grid_z += NEIGHBOR_STEPS[k][1]
+        return self.grid.cell_to_world(grid_x, grid_z)
+
+# 경로 추종용 폴리라인: 웨이포인트를 누적 호장(arc length)으로 색인하여
+# 현재 위치의 투영점과 그로부터 lookahead만큼 앞선 경로 위의 지점을 구함
+# - 투영은 현재 진행 위치 주변 window(미터) 구간의 선분만 벡터 연산으로 검사
+# - 진행 위치는 뒤로 가지 않으므로 지나친(overshoot) 웨이포인트로 되돌아가지 않음
+class PathTracker:
+    def __init__(self, waypoints: List[Tuple[float, float]]):
+        self.points = np.asarray(waypoints, dtype=np.float64).reshape(-1, 2)
+        self.segments = np.diff(self.points, axis=0)
+        self.lengths = np.hypot(self.segments[:, 0], self.segments[:, 1])
+        self.arc = np.concatenate(([0.0], np.cumsum(self.lengths)))
+        self.length = float(self.arc[-1])
+        self.progress = 0.0  # 현재까지 진행한 호장 위치
+
+    @property
+    def end(self) -> Tuple[float, float]:
+        return float(self.points[-1, 0]), float(self.points[-1, 1])
+
+    def segment_at(self, s: float) -> int:
+        # 호장 위치 s가 속한 선분 번호 (이진 탐색)
+        if len(self.lengths) == 0:
+            return 0
+        return int(min(max(np.searchsorted(self.arc, s, side="right") - 1, 0), len(self.lengths) - 1))
+
+    def point_at(self, s: float) -> Tuple[float, float]:
+        if len(self.lengths) == 0 or s <= 0.0:
+            return float(self.points[0, 0]), float(self.points[0, 1])
+        if s >= self.length:
+            return self.end
+        i = self.segment_at(s)
+        t = (s - self.arc[i]) / self.lengths[i] if self.lengths[i] > 0 else 0.0
+        x, z = self.points[i] + self.segments[i] * t
+        return float(x), float(z)
+
+    def _nearest(self, x: float, z: float, lo: int, hi: int) -> Tuple[float, float]:
+        # 선분 lo..hi-1에 대한 투영 중 가장 가까운 점의 (호장 위치, 거리)
+        seg = self.segments[lo:hi]
+        length_sq = self.lengths[lo:hi] ** 2
+        rel = np.array([x, z]) - self.points[lo:hi]
+        t = np.divide((rel * seg).sum(axis=1), length_sq, out=np.zeros_like(length_sq), where=length_sq > 0)
+        t = np.clip(t, 0.0, 1.0)
+        offset = rel - seg * t[:, None]
+        dist_sq = (offset ** 2).sum(axis=1)
+        k = int(np.argmin(dist_sq))
+        return float(self.arc[lo + k] + t[k] * self.lengths[lo + k]), math.sqrt(float(dist_sq[k]))
+
+    def project(self, x: float, z: float, window: Optional[float] = None) -> float:
+        # 현재 위치를 경로에 투영하여 진행 위치를 갱신하고 반환
+        # window가 None이거나 window 구간 안에서 window보다 멀리 벗어났으면 전체 경로에서 다시 찾음
+        if len(self.lengths) == 0:
+            return 0.0
+        count = len(self.lengths)
+        if window is not None:
+            lo = self.segment_at(self.progress)
+            hi = int(np.searchsorted(self.arc, self.progress + window, side="left"))
+            hi = min(max(hi, lo + 1), count)
+            s, dist = self._nearest(x, z, lo, hi)
+            if dist <= window:
+                self.progress = max(self.progress, s)
+                return self.progress
+        s, _ = self._nearest(x, z, 0, count)
+        self.progress = s if window is None else max(self.progress, s)
+        return self.progress
+
+# 경로 탐색 전용 작업 스레드: 최신 목적지만 탐색하고 결과를 콜백으로 전달
+class RoutePlanner:
+    def __init__(self, pathfinding: Pathfinding, grid: Grid, config: "NavigationConfig",
+                 on_route: Callable[[int, List[Tuple[float, float]], Optional[PlanResult]], None],
+                 on_field: Optional[Callable[[int, FlowField], None]] = None):
+        self.pathfinding = pathfinding
+        self.grid = grid
+        self.config = config
+        self.on_route = on_route
+        self.on_field = on_field
+        self._pending: Optional[Tuple[int, Tuple[float, float], Tuple[float, float]]] = None
+        self._pending_field: Optional[Tuple[int, Tuple[float, float]]] = None
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="route-planner", daemon=True)
+        self._thread.start()
+
+    def submit(self, token: int, start: Tuple[float, float], goal: Tuple[float, float]) -> None:
+        # 이전 요청이 아직 대기 중이면 덮어씀 (요청 병합)
+        with self._cond:
+            self._pending = (token, start, goal)
+            self._cond.notify()
+
+    def submit_field(self, token: int, goal: Tuple[float, float]) -> None:
+        # 흐름장 계산 요청, 경로 요청보다 낮은 우선순위로 처리
+        with self._cond:
+            self._pending_field = (token, goal)
+            self._cond.notify()
+
+    @property
+    def busy(self) -> bool:
+        return self._pending is not None or self._pending_field is not None
+
+    def close(self) -> None:
+        # 작업 스레드 종료, 진행 중인 탐색은 취소
+        with self._cond:
+            self._closed = True
+            self._pending = self._pending_field = None
+            self._cond.notify()
+
+    def _postprocess(self, grid: Grid, path: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+        if self.config.PATH_SMOOTHING:
+            with metrics.timer("smooth_path"):
+                return PathSmoother(grid, self.config.SMOOTHING_COST_TOLERANCE).smooth(path, self.config.WAYPOINT_SPACING)
+        return list(path)
+
+    def _run(self) -> None:
+        cancelled = lambda: self._pending is not None or self._closed
+        while True:
+            with self._cond:
+                while self._pending is None and self._pending_field is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                route_request, field_request = self._pending, None
+                if route_request is None:
+                    field_request, self._pending_field = self._pending_field, None
+                self._pending = None
+
+            grid = self.grid.snapshot()
+            if field_request is not None:
+                token, goal = field_request
+                with metrics.timer("flow_field"):
+                    field = FlowField.compute(grid, goal, cancel=cancelled)
+                if field is None:
+                    # 경로 요청에 밀려 중단된 경우 다시 대기열에 넣음
+                    with self._cond:
+                        if self._pending_field is None:
+                            self._pending_field = field_request
+                elif self.on_field is not None:
+                    self.on_field(token, field)
+                continue
+
+            token, start, goal = route_request
+            with metrics.timer("find_path"):
+                result = self.pathfinding.plan(start, goal, grid, self.config.planning_time_budget(grid),
+                                               cancel=cancelled)
+                if result is not None and result.timed_out and not cancelled():
+                    # 시간 예산 안에 목표에 닿지 못함 (가장 가까운 셀까지의 중간 결과): 전달하지 않고 (이전 경로 유지)
+                    # 목표에 닿거나 도달 불가가 확정될 때까지 마감 없이 계속 탐색, 새 요청이나 종료 시에만 중단
+                    for result in self.pathfinding.refine(start, goal, grid, after=result, cancel=cancelled):
+                        if result.reached or result.exhausted or result.timed_out:
+                            break
+            if cancelled():
+                continue
+            self.on_route(token, self._postprocess(grid, result.path) if result else [], result)
+            if result is None or result.final:
+                continue
+            # 시간 예산 밖에서 경로를 계속 개선, 새 요청이 들어오거나 REFINE_TIME_BUDGET이 지나면 중단
+            budget = self.config.REFINE_TIME_BUDGET
+            deadline = time.perf_counter() + budget if budget is not None else None
+            for improved in self.pathfinding.refine(start, goal, grid, after=result, deadline=deadline,
+                                                    cancel=cancelled):
+                if improved.timed_out or cancelled():
+                    break
+                if improved.path:
+                    self.on_route(token, self._postprocess(grid, improved.path), improved)
+
+# 위치 입력 변환: "x,y,z" 문자열, (x, y, z) / (x, z) 숫자 시퀀스, {"x", "y", "z"} 딕셔너리
+def parse_position(position) -> Tuple[float, float, float]:
+    if isinstance(position, str):
+        x, y, z = map(float, position.split(","))
+    elif isinstance(position, dict):
+        x, y, z = float(position["x"]), float(position.get("y", 0.0)), float(position["z"])
+    elif len(position) == 2:
+        x, z = map(float, position)
+        y = 0.0
+    else:
+        x, y, z = map(float, position)
+    return x, y, z
 
 # 제어 관련 클래스
 @dataclass
@@ -150,13 +747,34 @@ class NavigationConfig:
     SPEED_FACTOR: float = 0.8
     WEIGHT_FACTORS: Dict[str, float] = None
     WAYPOINT_OFFSET: float = 35
+    PATH_SMOOTHING: bool = True
+    WAYPOINT_SPACING: float = 0.0  # 0이면 스플라인 재샘플링 생략
+    SMOOTHING_COST_TOLERANCE: float = 1.0  # 경로 당기기 시 허용하는 근접 비용 증가량
+    TRAJECTORY_CAPACITY: int = 20000  # 실제 이동 경로 최대 저장 점 개수
+    TRAJECTORY_MIN_SPACING: float = 0.5  # 이보다 가까운 점은 저장하지 않음 (미터)
+    TRAJECTORY_TOLERANCE: float = 0.2  # 온라인 단순화 허용 오차 (미터)
+    VISUALIZATION_MAX_RATE: float = 1.0  # 경로 시각화 최대 렌더링 빈도 (Hz)
+    FLOW_FIELD: bool = False  # 목적지 기준 흐름장으로 조향 (경로 이탈 복구, 다수 전차가 같은 목표로 이동할 때)
+    PLANNING_TIME_BUDGET: Optional[float] = None  # 초, 시간 초과 시 최선 경로 반환 후 백그라운드에서 개선 (None이면 지도 크기에 비례)
+    PLANNING_TIME_PER_CELL: float = 2e-6  # 초, 셀당 탐색 예산 (셀 확장 비용 약 5us, 지도의 약 40%를 탐색할 수 있는 시간)
+    PLANNING_TIME_MIN: float = 0.05  # 초, 지도 크기에 비례한 예산의 최솟값
+    REFINE_TIME_BUDGET: Optional[float] = 2.0  # 초, 백그라운드 경로 개선 최대 시간 (None이면 제한 없음)
+    TRACKING_WINDOW: float = 20.0  # 경로 투영 시 현재 진행 위치에서 앞쪽으로 검사하는 구간 길이 (미터)
+    RANDOM_SEED: Optional[int] = None  # 명령 선택 난수 시드 (None이면 매 실행마다 다름)
 
     def __post_init__(self):
         if self.WEIGHT_FACTORS is None:
             self.WEIGHT_FACTORS = {"D": 0.6, "A": 0.6, "W": 0.5, "S": 0.5}
 
+    def planning_time_budget(self, grid: Grid) -> float:
+        # 셀 크기가 작을수록(셀 수가 많을수록) 같은 경로를 찾는 데 더 오래 걸림
+        if self.PLANNING_TIME_BUDGET is not None:
+            return self.PLANNING_TIME_BUDGET
+        return max(self.PLANNING_TIME_MIN, grid.width * grid.height * self.PLANNING_TIME_PER_CELL)
+
 class NavigationController:
-    def __init__(self, config: NavigationConfig, pathfinding: Pathfinding, grid: Grid):
+    def __init__(self, config: NavigationConfig, pathfinding: Pathfinding, grid: Grid,
+                 visualization_file: str = VISUALIZATION_FILE):
         self.config = config
         self.pathfinding = pathfinding
         self.grid = grid
@@ -169,12 +787,38 @@ class NavigationController:
         self.initial_distance: Optional[float] = None
         self.waypoints: List[Tuple[float, float]] = []
         self.current_waypoint_idx: int = 0
+        self.tracker: Optional[PathTracker] = None  # 현재 추종 중인 경로 (호장 색인)
         self.completed: bool = False
-        self.actual_path: List[Tuple[float, float]] = []  # 실제 이동 경로 저장
+        self.route_reached: bool = False  # 현재 경로가 목적지에 닿는지 (False면 가장 가까운 셀까지의 경로)
+        self._route_goal: Optional[Tuple[float, float]] = None  # 현재 경로를 탐색한 목적지
+        # 명령 선택용 난수 생성기 (전차별로 분리, 시드 지정 시 재현 가능)
+        self.rng = random.Random(config.RANDOM_SEED)
+        # 실제 이동 경로 저장 (고정 크기 링 버퍼 + 온라인 단순화)
+        self.actual_path = TrajectoryBuffer(config.TRAJECTORY_CAPACITY, config.TRAJECTORY_MIN_SPACING,
+                                            config.TRAJECTORY_TOLERANCE)
+        self.goal: Optional[Tuple[float, float]] = None  # 최종 목적지
+        # 경로 탐색 작업 스레드와 제어 루프 간 경로 교체 보호
+        self.route_lock = threading.RLock()
+        self._route_ready = threading.Condition()
+        self._plan_token: int = 0   # 가장 최근에 요청한 경로 번호
+        self._route_token: int = 0  # 현재 추종 중인 경로 번호
+        self.flow_field: Optional[FlowField] = None
+        self._field_requested_version: Optional[int] = None
+        self.planner = RoutePlanner(pathfinding, grid, config, self._on_route, self._on_field)
+        self.visualizer = PathVisualizer(self, output_path=visualization_file, max_rate=config.VISUALIZATION_MAX_RATE)
+        self.live_stream = LiveStream(self)
+        grid.listeners.append(self._on_obstacle_change)
 
-    def update_position(self, position: str) -> Dict:
+    def close(self) -> None:
+        # 공유 지도 구독 해제 및 경로 탐색/시각화 스레드 종료 (세션 제거 시)
+        if self._on_obstacle_change in self.grid.listeners:
+            self.grid.listeners.remove(self._on_obstacle_change)
+        self.planner.close()
+        self.visualizer.stop()
+
+    def update_position(self, position) -> Dict:
         try:
-            x, y, z = map(float, position.split(","))
+            x, y, z = parse_position(position)
             new_position = (x, z)
             now = time.time()
             dt = now - self.last_update_time
@@ -194,11 +838,14 @@ class NavigationController:
                         math.sin(self.current_heading), math.cos(self.current_heading)
                     )
 
-            self.current_position = new_position
-            # 실제 이동 경로에 현재 위치 추가
-            self.actual_path.append(new_position)
-            # 시각화 갱신
-            self.visualize_path()
+            # 위치/실제 경로 갱신과 pose 발행을 실시간 시각화의 전체 상태(snapshot) 생성과 겹치지 않도록 묶음
+            with self.route_lock:
+                self.current_position = new_position
+                # 실제 이동 경로에 현재 위치 추가
+                path_change = self.actual_path.append(new_position)
+                # 시각화 갱신
+                self.visualize_path()
+                self._publish_pose(path_change)
             return {
                 "status": "OK",
                 "current_position": self.current_position,
@@ -207,27 +854,31 @@ class NavigationController:
         except Exception as e:
             return {"status": "ERROR", "message": str(e)}
 
-    def set_destination(self, destination: str) -> Dict:
+    def set_destination(self, destination, wait: float = 0.0) -> Dict:
+        # 경로 탐색은 RoutePlanner 작업 스레드에서 수행, 새 경로가 교체될 때까지 이전 경로를 계속 추종
+        # wait > 0이면 첫 경로가 도착할 때까지 최대 wait초 대기
         try:
-            x, y, z = map(float, destination.split(","))
-            x = max(0, min(x, WORLD_SIZE))
-            z = max(0, min(z, WORLD_SIZE))
-            self.destination = (x, z)
-            # 목적지 설정 시 실제 경로 초기화
-            self.actual_path = []
+            x, y, z = parse_position(destination)
+            x, z = self.grid.clamp_world(x, z)
             if self.current_position:
-                self.actual_path.append(self.current_position)  # 시작 위치 추가
-                # A* 경로 탐색 호출
-                self.waypoints = self.pathfinding.find_path(self.current_position, self.destination, self.grid)
-                self.current_waypoint_idx = 0
-                self.completed = False
-                if self.waypoints:
-                    self.destination = self.waypoints[0]
-                else:
-                    self.destination = None
-                    self.completed = True
+                with self.route_lock:
+                    self._plan_token += 1
+                    token = self._plan_token
+                    self.goal = (x, z)
+                    # 목적지 설정 시 실제 경로 초기화
+                    self.actual_path.reset(self.current_position)  # 시작 위치 추가
+                    self.live_stream.publish("path_reset", {"actual_path": self.actual_path.tolist()})
+                self.planner.submit(token, self.current_position, (x, z))
+                if self.config.FLOW_FIELD:
+                    self._request_field(token, (x, z))
                 curr_x, curr_z = self.current_position
                 self.initial_distance = math.sqrt((x - curr_x) ** 2 + (z - curr_z) ** 2)
+                if wait > 0:
+                    with self._route_ready:
+                        self._route_ready.wait_for(lambda: self._route_token == token, timeout=wait)
+            else:
+                self.destination = (x, z)
+                self.actual_path.clear()
             # print(f"Waypoints set: {self.waypoints}")
             # 시각화 호출
             self.visualize_path()
@@ -236,11 +887,52 @@ class NavigationController:
                 "destination": {"x": x, "y": y, "z": z},
                 "initial_distance": self.initial_distance,
                 "waypoints": self.waypoints,
+                "planning": self._route_token != self._plan_token,
+                "reached": self.route_reached,
                 "visualization_url": "http://127.0.0.1:5000/visualization"
             }
         except Exception as e:
             return {"status": "ERROR", "message": str(e)}
 
+    def _on_route(self, token: int, waypoints: List[Tuple[float, float]], result: Optional[PlanResult]) -> None:
+        # RoutePlanner 콜백: 최신 요청의 경로일 때만 원자적으로 교체
+        with self.route_lock:
+            if token != self._plan_token:
+                return
+            reached = result is not None and result.reached
+            if reached or not self.waypoints or self._route_goal != self.goal:
+                self._swap_route(waypoints, reached)
+                self._route_goal = self.goal
+            # 같은 목적지로 다시 탐색했는데도 닿지 못하면 현재 경로 유지
+            self._route_token = token
+        with self._route_ready:
+            self._route_ready.notify_all()
+
+    def _on_field(self, token: int, field: FlowField) -> None:
+        with self.route_lock:
+            if token == self._plan_token:
+                self.flow_field = field
+
+    def _request_field(self, token: int, goal: Tuple[float, float]) -> None:
+        self._field_requested_version = self.grid.version
+        self.planner.submit_field(token, goal)
+
+    def _swap_route(self, waypoints: List[Tuple[float, float]], reached: bool) -> None:
+        # 현재 위치를 새 경로 전체에 투영한 지점부터 이어서 추종
+        # 목적지에 닿지 못한 경로(reached=False)는 끝에 도착해도 완료로 표시하지 않고, 지도가 바뀌면 다시 탐색
+        self.waypoints = waypoints
+        self.route_reached = reached
+        self.current_waypoint_idx = 0
+        self.tracker = PathTracker(waypoints) if waypoints else None
+        if self.tracker is not None and self.current_position:
+            s = self.tracker.project(*self.current_position)
+            self.current_waypoint_idx = min(self.tracker.segment_at(s) + 1, len(waypoints) - 1)
+            self.initial_distance = self.tracker.length - s
+        self.destination = waypoints[self.current_waypoint_idx] if waypoints else None
+        self.completed = False
+        self.live_stream.publish("route", {"waypoints": waypoints, "index": self.current_waypoint_idx})
+        self.visualize_path()
+
     def _calculate_lookahead(self, distance: float) -> float:
         return min(
             self.config.LOOKAHEAD_MAX,
@@ -313,11 +1005,16 @@ class NavigationController:
             new_z -= move_distance * math.cos(self.current_heading)
         self.current_position = (new_x, new_z)
         # 실제 이동 경로에 업데이트된 위치 추가
-        self.actual_path.append(self.current_position)
+        path_change = self.actual_path.append(self.current_position)
         # 시각화 갱신
         self.visualize_path()
+        self._publish_pose(path_change)
 
     def get_move(self) -> Dict:
+        with metrics.timer("navigation"), self.route_lock:
+            return self._next_move()
+
+    def _next_move(self) -> Dict:
         if self.current_position is None or self.completed:
             return {"move": "STOP", "weight": 1.0, "current_waypoint": self.current_waypoint_idx, "completed": self.completed}
 
@@ -327,28 +1024,74 @@ class NavigationController:
         if not self.destination:
             return {"move": "STOP", "weight": 1.0, "current_waypoint": self.current_waypoint_idx, "completed": self.completed}
 
+        if self.config.FLOW_FIELD:
+            command = self._flow_move()
+            if command is not None:
+                return command
+
         curr_x, curr_z = self.current_position
-        dest_x, dest_z = self.destination
-        distance = math.sqrt((dest_x - curr_x) ** 2 + (dest_z - curr_z) ** 2)
+        tracker = self.tracker
+        if tracker is None:
+            # 경로가 아직 없으면 목적지로 직진
+            goal_x, goal_z = self.destination
+        else:
+            goal_x, goal_z = tracker.end
+        goal_distance = math.sqrt((goal_x - curr_x) ** 2 + (goal_z - curr_z) ** 2)
+
+        if goal_distance < self.config.TOLERANCE and tracker is not None and (
+                not self.route_reached or self._route_token != self._plan_token):
+            # 목적지에 닿지 못한 경로의 끝이거나 새 목적지의 경로를 기다리는 중: 완료로 표시하지 않고 정지
+            return {"move": "STOP", "weight": 1.0, "current_waypoint": self.current_waypoint_idx, "completed": False}
+        if goal_distance < self.config.TOLERANCE:
+            self.completed = True
+            self.destination = None
+            self.initial_distance = None
+            return {
+                "move": "STOP",
+                "weight": 1.0,
+                "current_waypoint": self.current_waypoint_idx,
+                "completed": self.completed
+            }
+        if tracker is None:
+            return self._drive(curr_x, curr_z, goal_x, goal_z, goal_distance)
+
+        # pure pursuit: 경로 위 투영점에서 lookahead만큼 앞선 지점을 향해 조향
+        s = tracker.project(curr_x, curr_z, self.config.TRACKING_WINDOW)
+        index = min(tracker.segment_at(s) + 1, len(self.waypoints) - 1)
+        if index != self.current_waypoint_idx:
+            self.current_waypoint_idx = index
+            self.destination = self.waypoints[index]
+            self.live_stream.publish("waypoint", {"index": index})
+        # 남은 거리는 경로를 따라 잰 거리 (경로 끝을 지나쳤으면 목적지까지의 직선 거리)
+        distance = max(tracker.length - s, goal_distance)
+        target_x, target_z = tracker.point_at(s + self._calculate_lookahead(distance))
+        return self._drive(curr_x, curr_z, target_x, target_z, distance)
+
+    def _flow_move(self) -> Optional[Dict]:
+        # 흐름장 모드: 완료/감속은 최종 목적지까지의 거리로, 조향은 흐름장을 따라간 전방 지점으로 판단
+        # 흐름장이 아직 없거나 현재 셀에서 도달 불가면 None을 반환하여 웨이포인트 추종으로 대체
+        field = self.flow_field
+        if field is None or self.goal is None or field.goal != self.goal:
+            return None
+        if field.version != self.grid.version and self._field_requested_version != self.grid.version:
+            # 지도가 바뀌었으면 다시 계산 요청, 새 흐름장이 올 때까지 이전 것을 사용
+            self._request_field(self._plan_token, self.goal)
 
+        curr_x, curr_z = self.current_position
+        goal_x, goal_z = self.goal
+        distance = math.sqrt((goal_x - curr_x) ** 2 + (goal_z - curr_z) ** 2)
         if distance < self.config.TOLERANCE:
-            if self.current_waypoint_idx == len(self.waypoints) - 1:
-                self.completed = True
-                self.destination = None
-                self.initial_distance = None
-                return {
-                    "move": "STOP",
-                    "weight": 1.0,
-                    "current_waypoint": self.current_waypoint_idx,
-                    "completed": self.completed
-                }
-            else:
-                self.current_waypoint_idx += 1
-                self.destination = self.waypoints[self.current_waypoint_idx]
-                self.initial_distance = None
-                dest_x, dest_z = self.destination
-                distance = math.sqrt((dest_x - curr_x) ** 2 + (dest_z - curr_z) ** 2)
+            self.completed = True
+            self.destination = None
+            self.initial_distance = None
+            return {"move": "STOP", "weight": 1.0, "current_waypoint": self.current_waypoint_idx, "completed": self.completed}
 
+        target = field.lookahead_point(curr_x, curr_z, self._calculate_lookahead(distance))
+        if target is None:
+            return None
+        return self._drive(curr_x, curr_z, target[0], target[1], distance)
+
+    def _drive(self, curr_x: float, curr_z: float, dest_x: float, dest_z: float, distance: float) -> Dict:
         lookahead_distance = self._calculate_lookahead(distance)
         steering, heading_error = self._calculate_steering(curr_x, curr_z, dest_x, dest_z, lookahead_distance)
         self.last_steering = steering
@@ -362,7 +1105,7 @@ class NavigationController:
             return {"move": "STOP", "weight": 1.0, "current_waypoint": self.current_waypoint_idx, "completed": self.completed}
 
         weights = [dynamic_weights[cmd] for cmd in commands]
-        chosen_cmd = random.choices(commands, weights=weights, k=1)[0]
+        chosen_cmd = self.rng.choices(commands, weights=weights, k=1)[0]
         self.last_command = chosen_cmd
 
         if chosen_cmd:
@@ -375,75 +1118,25 @@ class NavigationController:
             "completed": self.completed
         }
 
-    def visualize_path(self):
-        if not self.current_position:
-            print("Visualization skipped: No current position available.")
-            return
+    def _publish_pose(self, path_change: Optional[str]) -> None:
+        # path_change: 실제 경로에 현재 위치가 추가("added")/마지막 점 교체("replaced")되었는지 (버려지면 None)
+        if self.live_stream.active:
+            x, z = self.current_position
+            self.live_stream.publish("pose", {"x": x, "z": z, "heading": math.degrees(self.current_heading),
+                                              "path": path_change})
 
-        # Plotly Figure 생성
-        fig = go.Figure()
-
-        # 장애물 시각화 (원래 좌표를 사용해 사각형으로 표시)
-        for i, obstacle in enumerate(self.grid.original_obstacles):
-            x_min = obstacle["x_min"]
-            x_max = obstacle["x_max"]
-            z_min = obstacle["z_min"]
-            z_max = obstacle["z_max"]
-            # 사각형의 4개 꼭짓점 정의 (시계 방향)
-            x_coords = [x_min, x_max, x_max, x_min, x_min]
-            z_coords = [z_min, z_min, z_max, z_max, z_min]
-            fig.add_trace(go.Scatter(
-                x=x_coords,
-                y=z_coords,
-                mode='lines',
-                fill='toself',
-                fillcolor='black',
-                line=dict(color='black'),
-                opacity=0.6,
-                name=f'Obstacle {i+1}'
-            ))
-
-        # A* 경로 시각화 (파란 선)
-        if self.waypoints:
-            path_x = [point[0] for point in self.waypoints]
-            path_z = [point[1] for point in self.waypoints]
-            fig.add_trace(go.Scatter(x=path_x, y=path_z, mode='lines', line=dict(color='blue'), name='A* Path'))
-
-        # 실제 이동 경로 시각화 (초록 선)
-        if self.actual_path:
-            actual_x = [point[0] for point in self.actual_path]
-            actual_z = [point[1] for point in self.actual_path]
-            fig.add_trace(go.Scatter(x=actual_x, y=actual_z, mode='lines', line=dict(color='green'), name='Actual Path'))
-
-        # 전차 위치 (빨간 화살표)
-        curr_x, curr_z = self.current_position
-        fig.add_trace(go.Scatter(
-            x=[curr_x],
-            y=[curr_z],
-            mode='markers+text',
-            marker=dict(color='red', size=10, symbol='arrow', angle=math.degrees(self.current_heading)),
-            text=['Tank'],
-            textposition="top right",
-            name='Tank'
-        ))
-
-        # 최종 목적지 (빨간 별)
-        if self.waypoints:
-            final_goal = self.waypoints[-1]
-            fig.add_trace(go.Scatter(x=[final_goal[0]], y=[final_goal[1]], mode='markers', marker=dict(color='red', size=10, symbol='star'), name='Final Goal'))
-
-        # 레이아웃 설정
-        fig.update_layout(
-            title='Path Visualization',
-            xaxis_title='X',
-            yaxis_title='Z',
-            xaxis=dict(range=[0, WORLD_SIZE]),
-            yaxis=dict(range=[0, WORLD_SIZE]),
-            showlegend=True,
-            width=800,
-            height=800
-        )
+    def _on_obstacle_change(self, change: str, rect: Dict) -> None:
+        self.live_stream.publish("obstacle", {"change": change, "rect": rect})
+        self.visualize_path()
+        # 목적지에 닿지 못한 경로를 추종 중이면 바뀐 지도에서 다시 탐색 (그동안 현재 경로 유지)
+        with self.route_lock:
+            if self.goal is None or self.route_reached or self.current_position is None:
+                return
+            self._plan_token += 1
+            token = self._plan_token
+            start, goal = self.current_position, self.goal
+        self.planner.submit(token, start, goal)
 
-        # HTML 파일로 저장 (Plotly JS를 포함)
-        fig.write_html("path_visualization.html", include_plotlyjs='cdn', full_html=True)
-        # print("Visualization saved as path_visualization.html")
\ No newline at end of file
+    def visualize_path(self):
+        # 실제 렌더링은 PathVisualizer가 제어 루프 밖에서 수행
+        self.visualizer.mark_dirty()
@@ -14,6 +14,7 @@ import albumentations as A
 from transformers import SegformerForSemanticSegmentation, SegformerImageProcessor
 
 from sklearn.cluster import DBSCAN
+import metrics
 
 
 class_mapping = {
@@ -197,7 +198,8 @@ def get_item_dir(from_dir):
     return items, item_dir
 
 
-def get_vehicle_distance(seg_model, image_processor):
+def get_vehicle_distance(seg_model, image_processor, left_dir=left_dir, right_dir=right_dir):
+    # left_dir / right_dir: 스테레오 캡처 폴더 (전차마다 다른 폴더를 넘길 수 있음)
     left_items, left_item_dir = get_item_dir(left_dir)
     right_items, right_item_dir = get_item_dir(right_dir)
 
@@ -225,7 +227,8 @@ def get_vehicle_distance(seg_model, image_processor):
     )
 
     # 4. 시차 맵 계산
-    disparity = stereo.compute(img_left, img_right).astype(np.float32) / 16.0
+    with metrics.timer("sgbm"):
+        disparity = stereo.compute(img_left, img_right).astype(np.float32) / 16.0
 
     # 시차 맵 정규화 (시각화용)
     # disparity_visual = cv2.normalize(disparity, None, alpha=0, beta=255, norm_type=cv2.NORM_MINMAX, dtype=cv2.CV_8U)
@@ -258,7 +261,8 @@ def get_vehicle_distance(seg_model, image_processor):
     if len(pixel_coords) < 128 :
         return None 
 
-    db = DBSCAN(eps=5.0, min_samples=64, metric='euclidean').fit(pixel_coords)
+    with metrics.timer("dbscan"):
+        db = DBSCAN(eps=5.0, min_samples=64, metric='euclidean').fit(pixel_coords)
     labels = db.labels_
     n_clusters = len(set(labels)) - (1 if -1 in labels else 0)
     result = []
@@ -0,0 +1,75 @@
+import argparse
+from app import app, DETECT_CONCURRENCY
+
+# 운영용 서버 진입점 (app.py의 app.run은 개발 서버: 리로더/디버거 활성화)
+#
+# 실행:
+#   python serve.py                          # threaded: waitress (없으면 werkzeug 다중 스레드 서버)
+#   python serve.py --mode asgi              # asgi: uvicorn 이벤트 루프 + WSGI 스레드 풀
+#   python serve.py --threads 12 --port 5052
+# 선택 의존성: pip install waitress  /  pip install uvicorn
+#
+# 크기 산정:
+# - 프로세스는 항상 1개: 전차별 세션(경로 추종, 사격 통제, 감지 결과, 텔레메트리)이 모두 프로세스 메모리에 있음
+#   (여러 프로세스로 나누면 요청마다 다른 상태를 보게 됨), 전차가 여러 대여도 지도와 감지 모델은 하나를 공유
+#   전차는 X-Tank-Id 헤더 또는 tank 쿼리 인자로 구분 (sessions.py)
+# - 스레드 수 = 제어 요청 동시성(/info, /get_move, /get_action 또는 /tick: 시뮬레이터 1대당 보통 2~3) x 전차 수
+#              + DETECT_CONCURRENCY (/detect는 모든 전차를 합쳐 이 수를 넘으면 대기 없이 503)
+#              + 실시간 시각화 접속 수 (/visualization/stream은 접속 동안 스레드 하나를 점유)
+#              + 여유 2
+#   기본값 8은 시뮬레이터 1대, 감지 1, 시각화 2명 기준
+# - 감지 모델은 GPU/CPU를 오래 점유하므로 DETECT_CONCURRENCY는 1을 권장
+
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 5052
+DEFAULT_THREADS = 8
+
+
+def serve_threaded(host: str, port: int, threads: int) -> None:
+    try:
+        from waitress import serve
+    except ImportError:
+        # waitress가 없으면 werkzeug 다중 스레드 서버 (요청마다 스레드, 리로더/디버거 없음)
+        from werkzeug.serving import make_server
+        print(f"waitress not installed, using werkzeug threaded server on {host}:{port}")
+        make_server(host, port, app, threaded=True).serve_forever()
+        return
+    print(f"Serving with waitress on {host}:{port} ({threads} threads)")
+    # connection_limit: 시각화 스트림 등 오래 열린 연결이 있어도 새 연결을 받도록 여유 있게 설정
+    serve(app, host=host, port=port, threads=threads, connection_limit=threads * 8, channel_timeout=30)
+
+
+def serve_asgi(host: str, port: int, threads: int) -> None:
+    try:
+        import uvicorn
+        from uvicorn.middleware.wsgi import WSGIMiddleware
+    except ImportError:
+        raise SystemExit("uvicorn is not installed: pip install uvicorn")
+    print(f"Serving with uvicorn on {host}:{port} ({threads} WSGI threads)")
+    # Flask 앱은 WSGI이므로 스레드 풀에서 실행, 연결 처리와 keep-alive는 이벤트 루프가 담당
+    uvicorn.run(WSGIMiddleware(app, workers=threads), host=host, port=port, workers=1,
+                timeout_keep_alive=30, log_level="warning")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tank control API server")
+    parser.add_argument("--mode", choices=("threaded", "asgi"), default="threaded")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="server processes; state is in-process, so only 1 is supported")
+    args = parser.parse_args()
+    if args.workers != 1:
+        parser.error("--workers must be 1: tank sessions, the shared map and the detection model live in this process")
+    if args.threads < DETECT_CONCURRENCY + 2:
+        parser.error(f"--threads must be at least {DETECT_CONCURRENCY + 2} "
+                     f"(DETECT_CONCURRENCY={DETECT_CONCURRENCY} plus control requests)")
+    if args.mode == "asgi":
+        serve_asgi(args.host, args.port, args.threads)
+    else:
+        serve_threaded(args.host, args.port, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import os
+import re
+import time
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import firing as fire
+import path_finding as pf
+from utils import SharedData, TelemetryRecorder
+from targeting import TargetingEngine
+from visualization import VISUALIZATION_FILE
+
+# 한 프로세스에서 전차 여러 대를 제어: 전차 ID별 세션
+# - 세션마다: 텔레메트리(SharedData), 항법 제어기, 사격 통제 세션, 표적 추적, 감지 상태
+# - 모든 세션이 공유: 지도(Grid, 장애물 갱신은 모든 세션에 알림, 탐색용 복사본도 버전별로 하나만 생성)
+#                    감지 모델(PerceptionPool: 가중치 하나 + 동시 추론 수 제한)
+# - 요청의 X-Tank-Id 헤더 또는 tank 쿼리 인자로 세션 선택, 없으면 DEFAULT_TANK_ID (기존 단일 전차 클라이언트)
+# - 처음 요청한 전차의 세션을 만들고, IDLE_TIMEOUT 동안 요청이 없으면 제거 (스레드 종료, 지도 구독 해제)
+
+DEFAULT_TANK_ID = "default"
+TANK_ID_HEADER = "X-Tank-Id"
+TANK_ID_PARAM = "tank"
+TANK_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")  # 파일 이름과 지표 label에 그대로 사용
+
+
+@dataclass
+class SessionConfig:
+    IDLE_TIMEOUT: float = 300.0  # 초, 마지막 요청 후 이 시간이 지나면 세션 제거 (기본 전차 세션은 제외)
+    MAX_SESSIONS: int = 16       # 동시 세션 수 상한 (초과 시 새 전차의 요청은 503)
+    REAP_INTERVAL: float = 10.0  # 유휴 세션 검사 주기 (초)
+
+
+class SessionError(Exception):
+    status = 400
+
+
+class InvalidTankId(SessionError):
+    status = 400
+
+
+class SessionLimitError(SessionError):
+    status = 503
+
+
+def request_tank_id(request) -> str:
+    return request.headers.get(TANK_ID_HEADER) or request.args.get(TANK_ID_PARAM) or DEFAULT_TANK_ID
+
+
+def session_path(path: str, tank_id: str) -> str:
+    # 기본 전차는 원래 경로, 다른 전차는 파일 이름에 ID를 붙임 (latest_result.png -> latest_result.tank2.png)
+    if tank_id == DEFAULT_TANK_ID:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{tank_id}{ext}"
+
+
+class PerceptionPool:
+    # 감지 모델은 프로세스에 하나만 올리고 모든 전차가 공유, 동시 추론 수를 concurrency로 제한
+    def __init__(self, model, processor, concurrency: int = 1):
+        self.model = model
+        self.processor = processor
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        # 대기하지 않음: 빈 자리가 없으면 False (호출한 요청은 503)
+        if not self._slots.acquire(blocking=False):
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+
+class TankSession:
+    def __init__(self, tank_id: str, grid: pf.Grid, pathfinding: pf.Pathfinding, nav_config: pf.NavigationConfig,
+                 image_path: str, result_path: str, shared_data: Optional[SharedData] = None,
+                 stereo_dirs: Optional[Tuple[str, str]] = None, telemetry_log: Optional[str] = None):
+        self.tank_id = tank_id
+        self.shared_data = shared_data or SharedData()
+        self.nav_controller = pf.NavigationController(nav_config, pathfinding, grid,
+                                                      visualization_file=session_path(VISUALIZATION_FILE, tank_id))
+        self.fire_session = fire.FireControlSession()
+        self.targeting = TargetingEngine()
+        self.telemetry_recorder = TelemetryRecorder(session_path(telemetry_log, tank_id)) if telemetry_log else None
+        self.image_path = image_path      # /detect 업로드 이미지 임시 파일
+        self.result_path = result_path    # 세그멘테이션 결과 이미지 (/latest_result)
+        self.stereo_dirs = stereo_dirs    # (왼쪽, 오른쪽) 스테레오 캡처 폴더, None이면 기본 폴더
+        # 감지 상태
+        self.enemy_detected = False
+        self.detected_buffer = 0
+        self.destination_buffer = 0
+        self.enemy_list = []
+        # 평시 정찰 포탑 회전 방향
+        self.turret_rotate = 'Q'
+        self.created_at = self.last_seen = time.time()
+        self.nav_controller.visualizer.start()
+
+    def touch(self) -> None:
+        self.last_seen = time.time()
+
+    def idle(self, now: float, timeout: float) -> bool:
+        # 실시간 시각화 접속이 있는 동안은 유지
+        return now - self.last_seen > timeout and not self.nav_controller.live_stream.active
+
+    def describe(self) -> Dict:
+        controller = self.nav_controller
+        return {
+            "tank_id": self.tank_id,
+            "idle_seconds": time.time() - self.last_seen,
+            "telemetry_version": self.shared_data.version,
+            "position": controller.current_position,
+            "destination": controller.goal,
+            "waypoints": len(controller.waypoints),
+            "enemy_detected": self.enemy_detected,
+            "target": self.targeting.target,
+        }
+
+    def close(self) -> None:
+        self.nav_controller.close()
+        if self.telemetry_recorder:
+            self.telemetry_recorder.close()
+
+
+class SessionManager:
+    def __init__(self, factory: Callable[[str], TankSession], config: Optional[SessionConfig] = None):
+        self.factory = factory
+        self.config = config or SessionConfig()
+        self.sessions: Dict[str, TankSession] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def all(self) -> List[TankSession]:
+        return list(self.sessions.values())
+
+    def get(self, tank_id: str) -> TankSession:
+        # 없으면 생성, 조회와 touch를 잠금 안에서 하여 제거 검사와 엇갈리지 않도록 함
+        # (반환된 세션은 적어도 IDLE_TIMEOUT 동안 제거되지 않음)
+        with self._lock:
+            session = self.sessions.get(tank_id)
+            if session is None:
+                if not TANK_ID_PATTERN.match(tank_id):
+                    raise InvalidTankId(f"Invalid tank id: {tank_id!r}")
+                if len(self.sessions) >= self.config.MAX_SESSIONS:
+                    raise SessionLimitError(f"Session limit reached ({self.config.MAX_SESSIONS})")
+                session = self.sessions[tank_id] = self.factory(tank_id)
+                print(f"Session {tank_id} created")
+            session.touch()
+        return session
+
+    def remove(self, tank_id: str) -> bool:
+        with self._lock:
+            session = self.sessions.pop(tank_id, None)
+        if session is None:
+            return False
+        session.close()
+        return True
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        # 기본 전차 세션(기존 단일 전차 클라이언트)은 시뮬레이터가 멈춰 있어도 유지
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [tank_id for tank_id, session in self.sessions.items()
+                       if tank_id != DEFAULT_TANK_ID and session.idle(now, self.config.IDLE_TIMEOUT)]
+            removed = [self.sessions.pop(tank_id) for tank_id in expired]
+        for session in removed:
+            session.close()
+        return expired
+
+    def start(self) -> None:
+        def run():
+            while not self._stopped.wait(self.config.REAP_INTERVAL):
+                for tank_id in self.evict_idle():
+                    print(f"Session {tank_id} evicted (idle)")
+
+        self._thread = threading.Thread(target=run, name="session-reaper", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stopped.set()
+        with self._lock:
+            removed = list(self.sessions.values())
+            self.sessions.clear()
+        for session in removed:
+            session.close()
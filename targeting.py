@@ -0,0 +1,176 @@
+import math
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import numpy as np
+import firing as fire
+import metrics
+
+# 다중 표적 우선순위 결정 및 교전 표적 유지
+# - 감지 결과(enemy_list) 전체를 배열로 만들어 한 번에 점수 계산 (낮을수록 우선)
+#   거리, 포탑 선회량(playerTurretX 기준), 사격 제원표상 고각 가능 여부, 추적 유지 시간(track age)
+# - 프레임마다 다시 붙는 클러스터 id 대신 (거리, 방위) 최근접 연관으로 추적 번호를 유지
+# - 현재 표적은 다른 표적의 점수가 hysteresis 이상 낮아야 교체
+# 감지 항목에 방위('bearing', 도)나 위치('x', 'z', 선택 'y')가 있으면 사용하고,
+# 없으면 포탑 카메라 정면(playerTurretX)에 있는 것으로 간주
+
+
+@dataclass
+class TargetingConfig:
+    DISTANCE_WEIGHT: float = 1.0     # 거리 / 최대 사거리
+    SLEW_WEIGHT: float = 1.0         # |포탑 선회량| / 180도
+    ELEVATION_WEIGHT: float = 2.0    # 사거리/고각 범위 밖 표적 벌점
+    AGE_WEIGHT: float = 0.5          # 오래 추적된 표적 우대
+    AGE_CAP: int = 10                # 이 프레임 수 이상은 같은 우대
+    HYSTERESIS: float = 0.2          # 현재 표적 교체에 필요한 점수 차
+    GATE_DISTANCE: float = 10.0      # 추적 연관 허용 거리 차 (미터)
+    GATE_BEARING: float = 15.0       # 추적 연관 허용 방위 차 (도)
+    MAX_MISSED: int = 2              # 연속으로 놓치면 추적 삭제하는 프레임 수
+
+
+def _wrap_degrees(angle: np.ndarray) -> np.ndarray:
+    return (angle + 180.0) % 360.0 - 180.0
+
+
+class TargetingEngine:
+    def __init__(self, config: Optional[TargetingConfig] = None, table: Optional[fire.FiringTable] = None):
+        self.config = config or TargetingConfig()
+        self.table = table or fire.get_firing_table()
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        # 추적 상태 (추적별 배열)
+        self.track_ids = np.zeros(0, dtype=np.int64)
+        self.distances = np.zeros(0)
+        self.bearings = np.zeros(0)
+        self.delta_hs = np.zeros(0)
+        self.localized = np.zeros(0, dtype=bool)  # 감지 항목에 방위/위치가 있었는지
+        self.ages = np.zeros(0, dtype=np.int64)
+        self.missed = np.zeros(0, dtype=np.int64)
+        self.scores = np.zeros(0)
+        self.target: Optional[Dict] = None  # 현재 교전 표적
+        self._next_id = 0
+
+    def _measurements(self, detections: List[Dict], data: Optional[Dict]):
+        # 감지 결과를 (거리, 방위, 높이 차이, 방위 측정 여부) 배열로 변환
+        turret_x = float(data["playerTurretX"]) if data else 0.0
+        player = data["playerPos"] if data else {"x": 0.0, "y": 0.0, "z": 0.0}
+        enemy = data.get("enemyPos") if data else None
+        default_delta_h = float(enemy["y"]) - float(player["y"]) if enemy else 0.0
+        distances, bearings, delta_hs, localized = [], [], [], []
+        for detection in detections:
+            localized.append(("x" in detection and "z" in detection) or "bearing" in detection)
+            if "x" in detection and "z" in detection:
+                dx = float(detection["x"]) - float(player["x"])
+                dz = float(detection["z"]) - float(player["z"])
+                distance = float(detection.get("distance") or math.hypot(dx, dz))
+                bearing = math.degrees(math.atan2(dx, dz)) % 360.0
+            else:
+                distance = float(detection["distance"])
+                bearing = float(detection.get("bearing", turret_x))
+            distances.append(distance)
+            bearings.append(bearing)
+            delta_hs.append(float(detection["y"]) - float(player["y"]) if "y" in detection else default_delta_h)
+        return np.array(distances), np.array(bearings), np.array(delta_hs), np.array(localized, dtype=bool)
+
+    def _associate(self, distances: np.ndarray, bearings: np.ndarray) -> np.ndarray:
+        # 감지별로 연관된 기존 추적의 인덱스 (없으면 -1), 비용이 작은 쌍부터 탐욕적으로 연결
+        matches = np.full(len(distances), -1, dtype=np.int64)
+        if len(distances) == 0 or len(self.track_ids) == 0:
+            return matches
+        d_diff = np.abs(distances[:, None] - self.distances[None, :])
+        b_diff = np.abs(_wrap_degrees(bearings[:, None] - self.bearings[None, :]))
+        cost = d_diff / self.config.GATE_DISTANCE + b_diff / self.config.GATE_BEARING
+        cost[(d_diff > self.config.GATE_DISTANCE) | (b_diff > self.config.GATE_BEARING)] = np.inf
+        used_tracks = np.zeros(len(self.track_ids), dtype=bool)
+        for flat in np.argsort(cost, axis=None):
+            i, j = np.unravel_index(flat, cost.shape)
+            if not np.isfinite(cost[i, j]):
+                break
+            if matches[i] < 0 and not used_tracks[j]:
+                matches[i] = j
+                used_tracks[j] = True
+        return matches
+
+    def score(self, distances: np.ndarray, bearings: np.ndarray, delta_hs: np.ndarray, ages: np.ndarray,
+              turret_x: float) -> np.ndarray:
+        config = self.config
+        slew = np.abs(_wrap_degrees(bearings - turret_x))
+        feasible = ~np.isnan(self.table.lookup_many(distances, delta_hs))
+        return (config.DISTANCE_WEIGHT * distances / self.table.max_range +
+                config.SLEW_WEIGHT * slew / 180.0 +
+                config.ELEVATION_WEIGHT * (~feasible) -
+                config.AGE_WEIGHT * np.minimum(ages, config.AGE_CAP) / config.AGE_CAP)
+
+    def observe(self, detections: Optional[List[Dict]], data: Optional[Dict]) -> Optional[Dict]:
+        # /detect 결과로 추적을 갱신하고 교전 표적을 선택
+        with metrics.timer("targeting"), self._lock:
+            distances, bearings, delta_hs, localized = self._measurements(detections or [], data)
+            matches = self._associate(distances, bearings)
+
+            # 놓친 추적 정리
+            seen = np.zeros(len(self.track_ids), dtype=bool)
+            seen[matches[matches >= 0]] = True
+            missed = np.where(seen, 0, self.missed + 1)
+            keep = ~seen & (missed <= self.config.MAX_MISSED)
+
+            new = matches < 0
+            new_ids = np.arange(self._next_id, self._next_id + int(new.sum()))
+            self._next_id += len(new_ids)
+            ids = np.empty(len(distances), dtype=np.int64)
+            ids[~new] = self.track_ids[matches[~new]]
+            ids[new] = new_ids
+            ages = np.zeros(len(distances), dtype=np.int64)
+            ages[~new] = self.ages[matches[~new]] + 1
+
+            # 이번 프레임에 감지된 추적 + 아직 유지 중인(놓친) 추적
+            self.track_ids = np.concatenate([ids, self.track_ids[keep]])
+            self.distances = np.concatenate([distances, self.distances[keep]])
+            self.bearings = np.concatenate([bearings, self.bearings[keep]])
+            self.delta_hs = np.concatenate([delta_hs, self.delta_hs[keep]])
+            self.localized = np.concatenate([localized, self.localized[keep]])
+            self.ages = np.concatenate([ages, self.ages[keep]])
+            self.missed = np.concatenate([np.zeros(len(distances), dtype=np.int64), missed[keep]])
+
+            turret_x = float(data["playerTurretX"]) if data else 0.0
+            self.scores = self.score(self.distances, self.bearings, self.delta_hs, self.ages, turret_x)
+            self.target = self._select(turret_x, data)
+            return self.target
+
+    def _select(self, turret_x: float, data: Optional[Dict]) -> Optional[Dict]:
+        # 이번 프레임에 감지된 표적 중 최저 점수 선택
+        # 현재 표적은 추적이 유지되는 동안(잠깐 놓친 경우 포함) hysteresis를 적용하여 유지
+        current = np.flatnonzero(self.track_ids == self.target["id"]) if self.target is not None else []
+        visible = np.flatnonzero(self.missed == 0)
+        if len(visible) == 0:
+            return self._describe(int(current[0]), data) if len(current) else None
+        best = visible[np.argmin(self.scores[visible])]
+        if len(current) and self.scores[current[0]] <= self.scores[best] + self.config.HYSTERESIS:
+            best = current[0]
+        return self._describe(int(best), data)
+
+    def _describe(self, i: int, data: Optional[Dict]) -> Dict:
+        distance, bearing = float(self.distances[i]), float(self.bearings[i])
+        target = {
+            "id": int(self.track_ids[i]),
+            "distance": distance,
+            "bearing": bearing,
+            "delta_h": float(self.delta_hs[i]),
+            "age": int(self.ages[i]),
+            "score": float(self.scores[i]),
+            "feasible": self.table.lookup(distance, float(self.delta_hs[i])) is not None,
+            "localized": bool(self.localized[i]),
+        }
+        if data:
+            # 추정 월드 좌표 (app.get_target_coord와 같은 규칙)
+            player = data["playerPos"]
+            rad = math.radians(bearing)
+            target["x"] = math.sin(rad) * distance + float(player["x"])
+            target["z"] = math.cos(rad) * distance + float(player["z"])
+            target["y"] = float(player["y"]) + float(self.delta_hs[i])
+        return target
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
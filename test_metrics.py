@@ -0,0 +1,59 @@
+import re
+import metrics
+
+# Prometheus 텍스트 형식(0.0.4) 검사: 모든 표본이 바로 앞 TYPE 줄의 지표 이름에 속하는지 확인
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+SUFFIXES = {"histogram": ("_bucket", "_sum", "_count"), "counter": ("",), "gauge": ("",)}
+
+
+def parse(text):
+    families = {}
+    current = None
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            continue
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name not in families, f"duplicate family {name}"
+            current = families[name] = {"name": name, "kind": kind, "samples": []}
+            continue
+        match = SAMPLE.match(line)
+        assert match, f"malformed sample line {line!r}"
+        assert current is not None, f"sample before TYPE: {line!r}"
+        name = match.group(1)
+        assert name in (current["name"] + suffix for suffix in SUFFIXES[current["kind"]]), \
+            f"sample {name} does not belong to family {current['name']}"
+        current["samples"].append((name, match.group(2) or "", float(match.group(3))))
+    return families
+
+
+def test_render_parses():
+    registry = metrics.Registry()
+    registry.counter("test_requests_total", "Requests", ("route", "status")).labels(route='/a"b', status=200).inc(3)
+    registry.histogram("test_seconds", "Latency", ("stage",), buckets=(0.1, 1.0)).labels(stage="x").observe(0.5)
+    registry.gauge("test_queue", "Queue length", lambda: 7).labels()
+
+    families = parse(registry.render())
+    assert families["test_requests_total"]["kind"] == "counter"
+    assert families["test_requests_total"]["samples"] == [
+        ("test_requests_total", '{route="/a\\"b",status="200"}', 3.0)]
+    buckets = [value for name, _, value in families["test_seconds"]["samples"] if name == "test_seconds_bucket"]
+    assert buckets == [0.0, 1.0, 1.0]
+    assert families["test_queue"]["samples"] == [("test_queue", "", 7.0)]
+
+
+def test_counter_name_requires_total_suffix():
+    try:
+        metrics.Registry().counter("test_requests", "Requests")
+    except ValueError:
+        return
+    assert False, "counter without _total suffix was accepted"
+
+
+def test_default_registry_parses():
+    with metrics.timer("test_stage"):
+        pass
+    metrics.REQUESTS.labels(route="/test", status=200).inc()
+    families = parse(metrics.render())
+    assert families["tank_http_requests_total"]["kind"] == "counter"
+    assert families["tank_stage_seconds"]["kind"] == "histogram"
@@ -0,0 +1,118 @@
+import math
+from typing import List, Optional, Tuple
+import numpy as np
+
+# 실제 이동 경로 저장용 고정 크기 float32 링 버퍼
+# - 최소 간격(min_spacing)보다 가까운 점은 버림
+# - 온라인 단순화: 마지막 고정점에서 본 방향 허용 범위(sleeve) 안의 점은 마지막 점을 교체하여
+#   저장된 경로와 실제 경로의 오차가 tolerance 이하로 유지되도록 함
+# - 각 점을 i와 i + capacity에 두 번 기록하여 링이 한 바퀴 돌아도 view()는 항상 연속 구간(복사 없음)
+
+# append() 결과: 새 점 추가 / 마지막 점 교체 (버려지면 None)
+ADDED = "added"
+REPLACED = "replaced"
+
+
+class TrajectoryBuffer:
+    def __init__(self, capacity: int = 20000, min_spacing: float = 0.5, tolerance: float = 0.2):
+        self.capacity = max(2, int(capacity))
+        self.min_spacing = min_spacing
+        self.tolerance = tolerance
+        self._data = np.zeros((2 * self.capacity, 2), dtype=np.float32)
+        self._start = 0
+        self._size = 0
+        # 방향 허용 범위 (마지막 고정점 기준, 기준 방향 _ref에 대한 상대 각도)
+        self._ref = 0.0
+        self._lo = -math.pi
+        self._hi = math.pi
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
+
+    def reset(self, point: Optional[Tuple[float, float]] = None) -> None:
+        self.clear()
+        if point is not None:
+            self._push(point)
+
+    @property
+    def last(self) -> Optional[Tuple[float, float]]:
+        if not self._size:
+            return None
+        x, z = self._data[self._start + self._size - 1]
+        return float(x), float(z)
+
+    def view(self) -> np.ndarray:
+        # 복사 없는 (n, 2) 읽기 전용 뷰
+        view = self._data[self._start:self._start + self._size]
+        view.flags.writeable = False
+        return view
+
+    def tolist(self) -> List[Tuple[float, float]]:
+        return [(float(x), float(z)) for x, z in self.view()]
+
+    def append(self, point: Tuple[float, float]) -> Optional[str]:
+        # 새 점을 추가하면 ADDED, 마지막 점을 교체하면 REPLACED, 버려지면 None
+        x, z = point
+        last = self.last
+        if last is None:
+            self._push(point)
+            return ADDED
+        if math.hypot(x - last[0], z - last[1]) < self.min_spacing:
+            return None
+        if self._size < 2:
+            self._start_sleeve(last, point)
+            self._push(point)
+            return ADDED
+
+        anchor = self._point(self._size - 2)
+        dx, dz = x - anchor[0], z - anchor[1]
+        distance = math.hypot(dx, dz)
+        if distance <= self.tolerance:
+            return None
+        angle = math.atan2(dz, dx) - self._ref
+        angle = math.atan2(math.sin(angle), math.cos(angle))
+        if self._lo <= angle <= self._hi:
+            # 마지막 고정점에서 직선으로 이어도 지나온 점들과의 오차가 tolerance 이내: 마지막 점 교체
+            spread = math.asin(min(1.0, self.tolerance / distance))
+            self._lo = max(self._lo, angle - spread)
+            self._hi = min(self._hi, angle + spread)
+            self._set(self._size - 1, point)
+            return REPLACED
+        # 방향이 벗어나면 마지막 점을 고정하고 새 구간 시작
+        self._start_sleeve(last, point)
+        self._push(point)
+        return ADDED
+
+    def _start_sleeve(self, anchor: Tuple[float, float], point: Tuple[float, float]) -> None:
+        dx, dz = point[0] - anchor[0], point[1] - anchor[1]
+        distance = math.hypot(dx, dz)
+        self._ref = math.atan2(dz, dx)
+        spread = math.asin(min(1.0, self.tolerance / distance)) if distance > 0 else math.pi
+        self._lo, self._hi = -spread, spread
+
+    def _point(self, i: int) -> Tuple[float, float]:
+        x, z = self._data[self._start + i]
+        return float(x), float(z)
+
+    def _set(self, i: int, point: Tuple[float, float]) -> None:
+        slot = (self._start + i) % self.capacity
+        self._data[slot] = point
+        self._data[slot + self.capacity] = point
+
+    def _push(self, point: Tuple[float, float]) -> None:
+        if self._size == self.capacity:
+            # 가장 오래된 점을 버림
+            self._start = (self._start + 1) % self.capacity
+            self._size -= 1
+        self._size += 1
+        self._set(self._size - 1, point)
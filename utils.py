@@ -1,5 +1,10 @@
+import json
+import time
 import threading
+import itertools
 import logging
+from types import MappingProxyType
+from typing import Any, NamedTuple, Optional
 
 logging.basicConfig(
     filename='utils.log',
@@ -7,21 +12,92 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+def freeze(value: Any) -> Any:
+    # 딕셔너리/리스트를 읽기 전용(MappingProxyType/tuple)으로 재귀 복사
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class Snapshot(NamedTuple):
+    version: int        # 발행 순서 (1부터 단조 증가, 0은 아직 발행 전)
+    data: Any           # 읽기 전용 텔레메트리 (None이면 발행 전)
+    published_at: float
+
+
+# 텔레메트리 스냅샷 저장소
+# - 발행 시 읽기 전용 복사본을 만들어 참조 하나를 교체 (읽기는 잠금 없이 현재 참조를 반환)
+# - 발행자끼리만 잠금으로 순서를 맞추고, wait_for(version)으로 더 새로운 스냅샷을 기다릴 수 있음
 class SharedData:
     def __init__(self):
-        self.data = None
-        self.lock = threading.Lock()
+        self._snapshot = Snapshot(0, None, 0.0)
+        self._sequence = itertools.count(1)
+        self._write_lock = threading.Lock()
+        self._published = threading.Condition(threading.Lock())
+        self._waiters = 0
+
+    @property
+    def data(self):
+        return self._snapshot.data
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
 
+    def publish(self, data) -> Snapshot:
+        frozen = freeze(data)
+        with self._write_lock:
+            snapshot = Snapshot(next(self._sequence), frozen, time.time())
+            self._snapshot = snapshot
+        if self._waiters:
+            with self._published:
+                self._published.notify_all()
+        return snapshot
+
+    def wait_for(self, version: int, timeout: Optional[float] = None) -> Optional[Snapshot]:
+        # version보다 새로운 스냅샷을 반환, timeout 안에 발행되지 않으면 None
+        snapshot = self._snapshot
+        if snapshot.version > version:
+            return snapshot
+        with self._published:
+            self._waiters += 1
+            try:
+                if not self._published.wait_for(lambda: self._snapshot.version > version, timeout):
+                    return None
+            finally:
+                self._waiters -= 1
+        return self._snapshot
+
+    # 기존 인터페이스
     def set_data(self, data):
-        with self.lock:
-            self.data = data
-            #logging.info(f"SharedData updated: time={data.get('time', 0.0)}")
-            #print(f"SharedData updated: time={data.get('time', 0.0)}")
+        self.publish(data)
 
     def get_data(self):
-        with self.lock:
-            logging.debug("SharedData accessed")
-            return self.data
+        return self._snapshot.data
+
+class TelemetryRecorder:
+    # /info 페이로드를 JSON Lines 파일에 기록 (fire_replay.py로 재생), 파일은 close까지 열어 둠
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", buffering=1)  # 줄 단위 버퍼: 프레임마다 파일에 반영
+        self._lock = threading.Lock()
+
+    def record(self, data) -> None:
+        line = json.dumps(data)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
 
 class SharedKeyValue:
     def __init__(self):
@@ -36,7 +112,6 @@ class SharedKeyValue:
 
     def get_key_value(self):
         with self.lock:
-            logging.debug("SharedKeyValue accessed")
             return self.value
     
 class SharedGoalPosition:
@@ -58,9 +133,7 @@ class SharedGoalPosition:
         with self.lock:
             if self.x is None or self.y is None or self.z is None:
                 return None
-            goal = {"x": self.x, "y": self.y, "z": self.z}
-            logging.debug(f"Goal position accessed: {goal}")
-            return goal
+            return {"x": self.x, "y": self.y, "z": self.z}
 
 shared_data = SharedData()
 shared_key_value = SharedKeyValue()
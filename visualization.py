@@ -0,0 +1,232 @@
+import os
+import math
+import json
+import time
+import queue
+import threading
+from typing import Dict, Iterator, List, Optional
+import plotly.graph_objects as go
+import metrics
+
+# 경로 시각화: 제어 루프에서는 변경 표시(dirty)만 하고, 실제 그림 생성과 파일 저장은
+# /visualization 요청 시 또는 보는 사람이 있을 때 백그라운드에서 최대 max_rate(Hz)로 수행
+
+VISUALIZATION_FILE = "path_visualization.html"
+
+
+class PathVisualizer:
+    def __init__(self, controller, output_path: str = VISUALIZATION_FILE, max_rate: float = 1.0,
+                 viewer_timeout: float = 10.0):
+        self.controller = controller
+        self.output_path = output_path
+        self.max_rate = max_rate              # 초당 최대 렌더링 횟수
+        self.viewer_timeout = viewer_timeout  # 마지막 요청 후 이 시간 동안만 백그라운드 렌더링
+        self.dirty = True
+        self.last_render_time = 0.0
+        self.last_request_time: Optional[float] = None
+        self.render_count = 0
+        self._render_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def mark_dirty(self) -> None:
+        # 제어 루프에서 호출, 플래그만 설정
+        self.dirty = True
+
+    @property
+    def min_interval(self) -> float:
+        return 1.0 / self.max_rate if self.max_rate > 0 else 0.0
+
+    def request(self) -> bool:
+        # /visualization 요청 시 호출, 변경이 있고 최소 간격이 지났으면 렌더링
+        self.last_request_time = time.time()
+        return self.render()
+
+    def render(self, force: bool = False) -> bool:
+        if not force and (not self.dirty or time.time() - self.last_render_time < self.min_interval):
+            return False
+        # 다른 스레드가 렌더링 중이면 그 결과를 사용
+        if not self._render_lock.acquire(blocking=False):
+            return False
+        try:
+            self.dirty = False
+            with metrics.timer("visualize_path"):
+                fig = self.build_figure()
+                if fig is None:
+                    return False
+                # HTML 파일로 저장 (Plotly JS를 포함), 임시 파일에 쓴 뒤 교체하여 /visualization이 쓰는 중인 파일을 보내지 않도록 함
+                tmp_path = self.output_path + ".tmp"
+                fig.write_html(tmp_path, include_plotlyjs='cdn', full_html=True)
+                os.replace(tmp_path, self.output_path)
+            self.last_render_time = time.time()
+            self.render_count += 1
+            return True
+        finally:
+            self._render_lock.release()
+
+    def start(self) -> None:
+        # 보는 사람이 있는 동안 변경 사항을 주기적으로 미리 렌더링
+        def run():
+            while not self._stopped.wait(max(self.min_interval, 0.1)):
+                viewer_active = self.last_request_time is not None and \
+                    time.time() - self.last_request_time < self.viewer_timeout
+                if viewer_active:
+                    self.render()
+
+        self._thread = threading.Thread(target=run, name="path-visualizer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def build_figure(self) -> Optional[go.Figure]:
+        controller = self.controller
+        # 제어 루프와 겹치지 않도록 상태를 복사한 뒤 잠금 밖에서 그림 생성
+        with controller.route_lock:
+            if not controller.current_position:
+                print("Visualization skipped: No current position available.")
+                return None
+            current_position = controller.current_position
+            current_heading = controller.current_heading
+            waypoints = list(controller.waypoints)
+            actual_path = controller.actual_path.view().copy()
+        obstacles = controller.grid.original_obstacles
+        x_min, x_max, z_min, z_max = controller.grid.bounds
+
+        # Plotly Figure 생성
+        fig = go.Figure()
+
+        # 장애물 시각화 (원래 좌표를 사용해 사각형으로 표시, None으로 구분하여 하나의 trace로 묶음)
+        if obstacles:
+            x_coords, z_coords = [], []
+            for obstacle in obstacles:
+                # 사각형의 4개 꼭짓점 정의 (시계 방향)
+                x_coords += [obstacle["x_min"], obstacle["x_max"], obstacle["x_max"], obstacle["x_min"], obstacle["x_min"], None]
+                z_coords += [obstacle["z_min"], obstacle["z_min"], obstacle["z_max"], obstacle["z_max"], obstacle["z_min"], None]
+            fig.add_trace(go.Scatter(
+                x=x_coords,
+                y=z_coords,
+                mode='lines',
+                fill='toself',
+                fillcolor='black',
+                line=dict(color='black'),
+                opacity=0.6,
+                name=f'Obstacles ({len(obstacles)})'
+            ))
+
+        # A* 경로 시각화 (파란 선)
+        if waypoints:
+            path_x = [point[0] for point in waypoints]
+            path_z = [point[1] for point in waypoints]
+            fig.add_trace(go.Scatter(x=path_x, y=path_z, mode='lines', line=dict(color='blue'), name='A* Path'))
+
+        # 실제 이동 경로 시각화 (초록 선)
+        if len(actual_path):
+            fig.add_trace(go.Scatter(x=actual_path[:, 0], y=actual_path[:, 1], mode='lines', line=dict(color='green'), name='Actual Path'))
+
+        # 전차 위치 (빨간 화살표)
+        curr_x, curr_z = current_position
+        fig.add_trace(go.Scatter(
+            x=[curr_x],
+            y=[curr_z],
+            mode='markers+text',
+            marker=dict(color='red', size=10, symbol='arrow', angle=math.degrees(current_heading)),
+            text=['Tank'],
+            textposition="top right",
+            name='Tank'
+        ))
+
+        # 최종 목적지 (빨간 별)
+        if waypoints:
+            final_goal = waypoints[-1]
+            fig.add_trace(go.Scatter(x=[final_goal[0]], y=[final_goal[1]], mode='markers', marker=dict(color='red', size=10, symbol='star'), name='Final Goal'))
+
+        # 레이아웃 설정
+        fig.update_layout(
+            title='Path Visualization',
+            xaxis_title='X',
+            yaxis_title='Z',
+            xaxis=dict(range=[x_min, x_max]),
+            yaxis=dict(range=[z_min, z_max]),
+            showlegend=True,
+            width=800,
+            height=800
+        )
+        return fig
+
+
+# 실시간 시각화 스트림 (Server-Sent Events)
+# 변경분만 이벤트로 전송: pose(위치/방향, path가 added면 실제 경로에 추가할 점, replaced면 마지막 점 교체),
+# waypoint(추종 인덱스), route(새 경로), path_reset(실제 경로 초기화), obstacle(추가/삭제), snapshot(접속 시 전체 상태)
+
+class LiveSubscriber:
+    def __init__(self, max_events: int):
+        self.events: "queue.Queue[str]" = queue.Queue(maxsize=max_events)
+        self.stale = True  # True면 다음 전송 전에 전체 상태(snapshot)를 먼저 보냄
+
+
+class LiveStream:
+    def __init__(self, controller, max_events: int = 512, keepalive: float = 15.0):
+        self.controller = controller
+        self.max_events = max_events
+        self.keepalive = keepalive
+        self.subscribers: List[LiveSubscriber] = []
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return bool(self.subscribers)
+
+    def publish(self, event: str, payload: Dict) -> None:
+        # 제어 루프에서 호출, 구독자가 없으면 직렬화도 하지 않음
+        if not self.subscribers:
+            return
+        message = f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        with self._lock:
+            for subscriber in self.subscribers:
+                try:
+                    subscriber.events.put_nowait(message)
+                except queue.Full:
+                    # 느린 구독자는 쌓인 변경분을 버리고 전체 상태로 다시 동기화
+                    subscriber.stale = True
+                    with subscriber.events.mutex:
+                        subscriber.events.queue.clear()
+
+    def snapshot(self) -> Dict:
+        controller = self.controller
+        with controller.route_lock:
+            position = controller.current_position
+            return {
+                "pose": {"x": position[0], "z": position[1], "heading": math.degrees(controller.current_heading)}
+                if position else None,
+                "waypoints": list(controller.waypoints),
+                "waypoint_index": controller.current_waypoint_idx,
+                "actual_path": controller.actual_path.tolist(),
+                "obstacles": controller.grid.original_obstacles,
+                "bounds": controller.grid.bounds,
+            }
+
+    def stream(self) -> Iterator[str]:
+        # Flask Response에 넘기는 SSE 생성기
+        subscriber = LiveSubscriber(self.max_events)
+        with self._lock:
+            self.subscribers.append(subscriber)
+        try:
+            while True:
+                if subscriber.stale:
+                    # 전체 상태 생성과 대기 중인 변경분 삭제를 발행 잠금 안에서 함께 수행
+                    # (상태를 바꾸고 발행하는 쪽은 route_lock을 잡고 있으므로 같은 순서로 잠금)
+                    # 그 전에 쌓인 변경분은 전체 상태에 이미 포함되어 있으므로 다시 보내지 않음
+                    with self.controller.route_lock, self._lock:
+                        state = self.snapshot()
+                        subscriber.stale = False
+                        with subscriber.events.mutex:
+                            subscriber.events.queue.clear()
+                    yield f"event: snapshot\ndata: {json.dumps(state)}\n\n"
+                try:
+                    yield subscriber.events.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            with self._lock:
+                self.subscribers.remove(subscriber)
@@ -0,0 +1,196 @@
+import struct
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from flask import Response, jsonify
+import metrics
+
+try:
+    import msgpack
+except ImportError:  # 선택 의존성: pip install msgpack
+    msgpack = None
+
+# 요청/응답 직렬화 형식 (Content-Type으로 선택, 응답은 Accept 헤더 또는 요청과 같은 형식)
+# - application/json        : 기존 형식 (기본)
+# - application/msgpack     : JSON과 같은 구조를 MessagePack으로 (msgpack 설치 필요)
+# - application/x-tank-struct : 고정 길이 little-endian 바이너리 (아래 레이아웃)
+#
+# 고정 레이아웃:
+#   telemetry (요청, 112바이트)  14 x float64, TELEMETRY_FIELDS 순서
+#   position  (요청, 24바이트)   3 x float64 (x, y, z)
+#   pose      (응답)  uint8 ok, float64 x, float64 z, float64 heading(도)
+#   move      (응답)  uint8 MOVE_CODES 번호, float32 weight, int32 current_waypoint, uint8 completed
+#   action    (응답)  uint8 TURRET_CODES 번호, float32 weight
+#   detection (응답)  uint8 enemy_detected, uint16 enemies, int32 target id(-1: 없음), float32 target distance
+#   tick      (응답)  pose + move + action + detection
+#   route     (응답)  uint8 ok, uint8 planning, uint32 n, n x (float32 x, float32 z)
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+STRUCT = "application/x-tank-struct"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+TELEMETRY_FIELDS = (
+    ("time",), ("distance",),
+    ("enemyPos", "x"), ("enemyPos", "y"), ("enemyPos", "z"),
+    ("playerPos", "x"), ("playerPos", "y"), ("playerPos", "z"),
+    ("enemySpeed",), ("playerSpeed",), ("enemyBodyX",), ("playerBodyX",),
+    ("playerTurretX",), ("playerTurretY",),
+)
+MOVE_CODES = ("", "W", "A", "S", "D", "STOP")
+TURRET_CODES = ("", "Q", "E", "R", "F", "FIRE")
+
+TELEMETRY_STRUCT = struct.Struct("<%dd" % len(TELEMETRY_FIELDS))
+POSITION_STRUCT = struct.Struct("<3d")
+POSE_STRUCT = struct.Struct("<Bddd")
+MOVE_STRUCT = struct.Struct("<BfiB")
+ACTION_STRUCT = struct.Struct("<Bf")
+DETECTION_STRUCT = struct.Struct("<BHif")
+ROUTE_HEADER = struct.Struct("<BBI")
+
+
+class WireFormatError(ValueError):
+    pass
+
+
+def request_format(request) -> str:
+    mimetype = request.mimetype
+    if mimetype in MSGPACK_TYPES:
+        return MSGPACK
+    if mimetype == STRUCT:
+        return STRUCT
+    return JSON
+
+
+def response_format(request) -> str:
+    # Accept에 명시된 바이너리 형식 우선, 없으면 요청 본문 형식
+    best = request.accept_mimetypes.best
+    if best == STRUCT:
+        return STRUCT
+    if best in MSGPACK_TYPES:
+        return MSGPACK
+    return request_format(request) if request.content_length else JSON
+
+
+# 요청 해석
+
+def unpack_telemetry(body: bytes) -> Dict:
+    if len(body) != TELEMETRY_STRUCT.size:
+        raise WireFormatError(f"Telemetry must be {TELEMETRY_STRUCT.size} bytes, got {len(body)}")
+    data: Dict = {"enemyPos": {}, "playerPos": {}}
+    for path, value in zip(TELEMETRY_FIELDS, TELEMETRY_STRUCT.unpack(body)):
+        if len(path) == 1:
+            data[path[0]] = value
+        else:
+            data[path[0]][path[1]] = value
+    return data
+
+
+def pack_telemetry(data: Dict) -> bytes:
+    # 클라이언트/재생 도구용
+    return TELEMETRY_STRUCT.pack(*(float(data[p[0]] if len(p) == 1 else data[p[0]][p[1]]) for p in TELEMETRY_FIELDS))
+
+
+def unpack_position(body: bytes) -> Tuple[float, float, float]:
+    if len(body) != POSITION_STRUCT.size:
+        raise WireFormatError(f"Position must be {POSITION_STRUCT.size} bytes, got {len(body)}")
+    return POSITION_STRUCT.unpack(body)
+
+
+def _require_object(data, name: str) -> Dict:
+    if not isinstance(data, dict):
+        raise WireFormatError(f"{name} body must be an object, got {type(data).__name__}")
+    return data
+
+
+@metrics.timed("decode")
+def decode(request, layout: str = "telemetry", key: Optional[str] = None):
+    # 요청 본문을 JSON과 같은 구조로 변환
+    # struct 형식의 position은 {key: (x, y, z)}로 감싸서 JSON 요청({"position": ...})과 같은 모양으로 반환
+    # 본문이 없거나 객체(dict)가 아니면 WireFormatError (400)
+    fmt = request_format(request)
+    if fmt == JSON:
+        return _require_object(request.get_json(silent=True), "JSON")
+    body = request.get_data(cache=False)
+    if fmt == MSGPACK:
+        if msgpack is None:
+            raise WireFormatError("MessagePack is not available (pip install msgpack)")
+        try:
+            return _require_object(msgpack.unpackb(body, raw=False), "MessagePack")
+        except ValueError as e:
+            raise WireFormatError(f"Invalid MessagePack body: {e}")
+    if layout == "telemetry":
+        return unpack_telemetry(body)
+    if layout == "position":
+        return {key: unpack_position(body)}
+    raise WireFormatError(f"No binary layout for {layout}")
+
+
+# 응답 생성
+
+def _code(codes: Sequence[str], command: Optional[str]) -> int:
+    try:
+        return codes.index(command or "")
+    except ValueError:
+        raise WireFormatError(f"No binary code for command {command!r}")
+
+
+def pack_pose(pose: Dict) -> bytes:
+    x, z = pose.get("current_position") or (0.0, 0.0)
+    return POSE_STRUCT.pack(pose.get("status") == "OK", x, z, pose.get("heading", 0.0))
+
+
+def pack_move(move: Dict) -> bytes:
+    return MOVE_STRUCT.pack(_code(MOVE_CODES, move.get("move")), move.get("weight", 0.0),
+                            move.get("current_waypoint", -1), bool(move.get("completed")))
+
+
+def pack_action(action: Dict) -> bytes:
+    return ACTION_STRUCT.pack(_code(TURRET_CODES, action.get("turret")), action.get("weight", 1.0))
+
+
+def pack_detection(detection: Dict) -> bytes:
+    target = detection.get("target")
+    return DETECTION_STRUCT.pack(bool(detection.get("enemy_detected")), detection.get("enemies", 0),
+                                 target["id"] if target else -1, target["distance"] if target else 0.0)
+
+
+def pack_waypoints(waypoints: Sequence[Tuple[float, float]]) -> bytes:
+    return np.asarray(waypoints, dtype="<f4").reshape(-1, 2).tobytes()
+
+
+def pack_route(result: Dict) -> bytes:
+    waypoints = result.get("waypoints") or []
+    return ROUTE_HEADER.pack(result.get("status") == "OK", bool(result.get("planning")), len(waypoints)) + \
+        pack_waypoints(waypoints)
+
+
+def unpack_route(body: bytes) -> Dict:
+    ok, planning, count = ROUTE_HEADER.unpack_from(body)
+    points = np.frombuffer(body, dtype="<f4", count=2 * count, offset=ROUTE_HEADER.size).reshape(-1, 2)
+    return {"status": "OK" if ok else "ERROR", "planning": bool(planning), "waypoints": points.tolist()}
+
+
+STRUCT_ENCODERS = {
+    "pose": pack_pose,
+    "move": pack_move,
+    "action": pack_action,
+    "route": pack_route,
+    "tick": lambda r: pack_pose(r["pose"]) + pack_move(r["move"]) + pack_action(r["action"]) +
+    pack_detection(r["detection"]),
+}
+
+
+@metrics.timed("encode")
+def encode(payload: Dict, kind: str, fmt: str = JSON, status: int = 200) -> Response:
+    # 오류 응답(status >= 400)은 형식과 관계없이 JSON
+    if fmt == JSON or status >= 400:
+        response = jsonify(payload)
+    elif fmt == MSGPACK:
+        if msgpack is None:
+            response = jsonify(payload)
+        else:
+            response = Response(msgpack.packb(payload, use_bin_type=True), mimetype=MSGPACK)
+    else:
+        response = Response(STRUCT_ENCODERS[kind](payload), mimetype=STRUCT)
+    response.status_code = status
+    return response